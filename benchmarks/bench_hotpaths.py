@@ -0,0 +1,199 @@
+"""
+Benchmark the roster, group-check and formatting hot paths on synthetic data.
+
+Usage:
+    python benchmarks/bench_hotpaths.py                  # run and compare with baseline.json
+    python benchmarks/bench_hotpaths.py --quick          # smallest sizes only
+    python benchmarks/bench_hotpaths.py --save-baseline  # record the current numbers
+    python benchmarks/bench_hotpaths.py --check          # exit 1 on any regression
+
+Rosters of 100-10,000 groups and queues of 10-2,000 questions are generated
+from a fixed seed, so runs are reproducible. Nothing touches Discord or the
+network. Both time per call and peak memory are checked against the baseline.
+Timings are machine-specific: refresh the baseline when moving to different
+hardware.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue_bot  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MEMORY_SLACK = 1024  # Bytes of peak-memory growth never reported as a regression
+ROSTER_SIZES = (100, 1000, 10000)
+QUEUE_SIZES = (10, 200, 2000)
+TOPICS = (
+    "MP3 group {group} comp {comp}: page fault in the handler",
+    "[Conceptual] group {group}, computer {comp} - paging question",
+    "help with checkpoint 2",  # Wrong format
+    "mp group{group} comp{comp}",
+    "Is the TLB flushed on a context switch?",  # Wrong format
+)
+
+
+def make_netid(rng):
+    letters = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 6)))
+    return f"{letters}{rng.randint(1, 99)}"
+
+
+def write_roster_csv(path, groups, seed=0):
+    """Write a groups CSV of 2-4 member groups; returns the list of groups"""
+    rng = random.Random(seed)
+    seen = set()
+    rows = []
+    for _ in range(groups):
+        members = []
+        while len(members) < rng.randint(2, 4):
+            netid = make_netid(rng)
+            if netid not in seen:
+                seen.add(netid)
+                members.append(netid)
+        rows.append(members)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["member1", "member2", "member3", "member4"])
+        writer.writerows(rows)
+    return rows
+
+
+def make_questions(groups, size, seed=0):
+    """
+    Queue payload shaped like the API's questions list. About a third of the
+    questions come from groups that already have a member in the queue.
+    """
+    rng = random.Random(seed)
+    questions = []
+    queued_groups = []
+    for question_id in range(1, size + 1):
+        if queued_groups and rng.random() < 0.33:
+            group_number = rng.choice(queued_groups)
+        else:
+            group_number = rng.randrange(len(groups))
+            queued_groups.append(group_number)
+        netid = rng.choice(groups[group_number])
+        questions.append({
+            "id": question_id,
+            "topic": rng.choice(TOPICS).format(group=group_number + 1, comp=rng.randint(1, 40)),
+            "enqueueTime": "2025-03-04T15:00:00.000Z",
+            "beingAnswered": False,
+            "askedBy": {"netid": netid, "name": netid.upper()},
+        })
+    return questions
+
+
+def measure(fn, repeat=5):
+    """Best seconds per call, and the peak bytes allocated by a single call"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run_cases(roster_sizes, queue_sizes, directory):
+    """Yield (case name, items per call, seconds per call, peak bytes)"""
+    for groups in roster_sizes:
+        path = os.path.join(directory, f"groups-{groups}.csv")
+        rows = write_roster_csv(path, groups)
+        netid_count = sum(len(row) for row in rows)
+        seconds, peak = measure(lambda: queue_bot.load_groups_from_csv(path))
+        yield f"load_groups_from_csv[groups={groups}]", netid_count, seconds, peak
+        roster = queue_bot.load_groups_from_csv(path)
+
+        # The startup path: CSV unchanged, so the roster comes from its snapshot
+        snapshot_path = f"{path}.cache"
+        queue_bot.save_roster_snapshot(roster, snapshot_path, {
+            "mtime_ns": os.stat(path).st_mtime_ns,
+            "size": os.stat(path).st_size,
+            "sha256": queue_bot.file_sha256(path),
+        })
+        seconds, peak = measure(lambda: queue_bot.load_cached_roster(path, snapshot_path))
+        yield f"load_roster[snapshot,groups={groups}]", netid_count, seconds, peak
+
+        for size in queue_sizes:
+            questions = make_questions(rows, size)
+            netids = [queue_bot.extract_netid(question) for question in questions]
+            topics = [question["topic"] for question in questions]
+            groups_in_queue = queue_bot.check_group_members_in_queue(netids, roster)
+            label = f"groups={groups},questions={size}"
+
+            seconds, peak = measure(lambda: [queue_bot.extract_netid(q) for q in questions])
+            yield f"extract_netid[{label}]", size, seconds, peak
+            seconds, peak = measure(lambda: queue_bot.check_group_members_in_queue(netids, roster))
+            yield f"check_group_members_in_queue[{label}]", size, seconds, peak
+            seconds, peak = measure(lambda: queue_bot.format_groups_message(groups_in_queue, roster))
+            yield f"format_groups_message[{label}]", len(groups_in_queue), seconds, peak
+            if groups == roster_sizes[0]:
+                # Independent of the roster: measure once per queue size
+                seconds, peak = measure(lambda: queue_bot.check_message_format(netids, topics))
+                yield f"check_message_format[questions={size}]", size, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="only the smallest roster and queue sizes")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH}")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="time or peak-memory ratio that counts as a regression (default 1.25)")
+    args = parser.parse_args()
+
+    roster_sizes = ROSTER_SIZES[:1] if args.quick else ROSTER_SIZES
+    queue_sizes = QUEUE_SIZES[:1] if args.quick else QUEUE_SIZES
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<62} {'per call':>10} {'items/s':>12} {'peak KiB':>9}  vs baseline (time, memory)")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, items, seconds, peak in run_cases(roster_sizes, queue_sizes, directory):
+            results[name] = {"seconds": seconds, "peak_bytes": peak}
+            comparison = ""
+            if name in baseline:
+                time_ratio = seconds / baseline[name]["seconds"]
+                baseline_peak = baseline[name]["peak_bytes"]
+                memory_ratio = peak / baseline_peak if baseline_peak else 1.0
+                comparison = f"{time_ratio:.2f}x, {memory_ratio:.2f}x"
+                slower = time_ratio > args.threshold
+                bigger = memory_ratio > args.threshold and peak - baseline_peak > MEMORY_SLACK
+                if slower or bigger:
+                    kinds = " and ".join(kind for kind, hit in (("time", slower), ("memory", bigger)) if hit)
+                    comparison += f"  REGRESSION ({kinds})"
+                    regressions.append(name)
+            print(
+                f"{name:<62} {seconds * 1e6:>8.1f}us {items / seconds:>12,.0f} "
+                f"{peak / 1024:>9.1f}  {comparison}"
+            )
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} results to {BASELINE_PATH}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.2f}x: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark the office-hours schedule parser backends.
+
+Usage:
+    python benchmarks/bench_schedule.py [saved_lab.html] [--iterations N]
+
+Without a saved page, a synthetic lab.html from fake_queue_server is used.
+Every backend must produce the same schedule as the bs4 reference.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_queue_server  # noqa: E402
+import queue_bot  # noqa: E402
+
+
+def time_backend(backend, html, iterations):
+    """Best and mean seconds per parse over the given number of iterations"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        queue_bot.parse_schedule(html, backend)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("page", nargs="?", help="saved copy of lab.html")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding="utf-8") as f:
+            html = f.read()
+        source = args.page
+    else:
+        html = fake_queue_server.make_lab_html()
+        source = "synthetic lab.html"
+
+    backends = ["bs4", "fast"]
+    if queue_bot.lxml is not None:
+        backends.append("lxml")
+    else:
+        print("lxml not installed; skipping the lxml backend")
+
+    reference = queue_bot.parse_schedule(html, "bs4")
+    if reference is None:
+        sys.exit(f"{source}: no table.week found")
+
+    print(f"{source}: {len(html) / 1024:.1f} KiB, {args.iterations} iterations")
+    print(f"{'backend':<8} {'best ms':>9} {'mean ms':>9} {'speedup':>8}  same result")
+    baseline = None
+    for backend in backends:
+        best, mean = time_backend(backend, html, args.iterations)
+        baseline = baseline or mean
+        same = queue_bot.parse_schedule(html, backend) == reference
+        print(f"{backend:<8} {best * 1000:>9.2f} {mean * 1000:>9.2f} {baseline / mean:>7.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
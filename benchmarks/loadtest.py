@@ -0,0 +1,297 @@
+"""
+End-to-end load test of the bot against fake_queue_server and a fake Discord.
+
+Usage:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --queues 3 --questions 300 --users 100 --duration 60
+    python benchmarks/loadtest.py --latency 0.3 --error-rate 0.05   # slow, flaky API
+    python benchmarks/loadtest.py --push                           # push mode
+
+Starts the fake queue API and lab.html in-process, runs check_queue_periodically
+for every queue, and has simulated users fire !checkqueue, !checkall,
+!checkstaff and !eta concurrently while the queues churn. Group collisions are
+injected at a fixed rate to measure alert lag: the time from the second group
+member joining the queue until the alert reaches the fake alert channel.
+Command latency runs from invoking the handler until its whole reply has been
+delivered. Nothing connects to Discord or the real queue.
+"""
+
+import argparse
+import asyncio
+import collections
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMMANDS = ("checkqueue", "checkall", "checkstaff", "eta")
+ALERT_CHANNEL_BASE = 1000
+USER_CHANNEL_BASE = 100000
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, or None if there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+class FakeChannel:
+    """Stands in for a Discord text channel: records each message after a simulated API delay"""
+
+    def __init__(self, channel_id, latency):
+        self.id = channel_id
+        self.latency = latency
+        self.messages = []  # (monotonic time, text)
+
+    async def send(self, content=None, embeds=None):
+        await asyncio.sleep(self.latency)
+        text = content or "\n".join(embed.description or "" for embed in embeds or ())
+        self.messages.append((time.monotonic(), text))
+        self.received(text)
+
+    def received(self, text):
+        pass
+
+
+class FakeAlertChannel(FakeChannel):
+    """Alert channel for one queue; matches alerts to the collisions injected into it"""
+
+    def __init__(self, channel_id, latency, injected, lags):
+        super().__init__(channel_id, latency)
+        self.injected = injected  # group id -> monotonic time the collision was created
+        self.lags = lags
+
+    def received(self, text):
+        now = time.monotonic()
+        for group_id in [group_id for group_id in self.injected if f"**{group_id}**:" in text]:
+            self.lags.append(now - self.injected.pop(group_id))
+
+
+class FakeContext:
+    """The parts of commands.Context the command handlers use"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def send(self, content=None, embeds=None):
+        await self.channel.send(content, embeds=embeds)
+
+
+def pending_deliveries(queue_bot, channel):
+    """Futures of every reply still queued for a channel"""
+    sender = queue_bot.channel_senders.get(channel.id)
+    if sender is None:
+        return []
+    return [message.delivered for pending in sender.pending.values() for message in pending]
+
+
+async def run_user(queue_bot, user_number, args, queue_ids, netids, deadline, latencies, errors):
+    """One TA or student issuing commands back to back, with think time in between"""
+    rng = random.Random(args.seed * 100003 + user_number)
+    channel = FakeChannel(USER_CHANNEL_BASE + user_number, args.discord_latency)
+    ctx = FakeContext(channel)
+    await asyncio.sleep(rng.uniform(0, args.think_time))
+
+    while time.monotonic() < deadline:
+        name = rng.choice(COMMANDS)
+        if name == "eta":
+            command_args = (rng.choice(netids),) if rng.random() < 0.5 else ()
+        else:
+            command_args = (rng.choice(queue_ids),)
+
+        started_at = time.monotonic()
+        try:
+            await queue_bot.bot.get_command(name).callback(ctx, *command_args)
+            delivered = await asyncio.gather(*pending_deliveries(queue_bot, channel))
+        except Exception:
+            delivered = [False]
+        if all(delivered):
+            latencies[name].append(time.monotonic() - started_at)
+        else:
+            errors[name] += 1
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def inject_collisions(queue_bot, state, rows, queue_ids, args, deadline, injected):
+    """
+    Every --collision-interval seconds, add two members of a group that has nobody
+    in the queue, and note when the second one joined.
+    """
+    rng = random.Random(args.seed)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(args.collision_interval)
+        queue_id = rng.choice(queue_ids)
+        queued = {question["askedBy"]["netid"] for question in state.queue(queue_id)["questions"].values()}
+        candidates = [row for row in rows if len(row) > 1 and queued.isdisjoint(row)]
+        if not candidates:
+            continue
+
+        first, second = rng.sample(rng.choice(candidates), 2)
+        for netid in (first, second):
+            question = state.add_question(queue_id, netid, f"MP3 comp {rng.randint(1, 40)}")
+            await state.broadcast(queue_id, "question:create", {"question": question})
+        group_id = queue_bot.roster.group_id(queue_bot.roster.group_index(second))
+        injected[queue_id][group_id] = time.monotonic()
+
+
+async def run(args, port):
+    import fake_queue_server
+    import queue_bot
+    from aiohttp import web
+    from bench_hotpaths import write_roster_csv
+
+    queue_ids = [str(n) for n in range(1, args.queues + 1)]
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    injected = {queue_id: {} for queue_id in queue_ids}
+    alert_lags = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "groups.csv")
+        rows = write_roster_csv(csv_path, args.groups, seed=args.seed)
+        netids = [netid for row in rows for netid in row]
+
+        state = fake_queue_server.FakeQueueState(args.seed, netids)
+        for queue_id in queue_ids:
+            state.populate(queue_id, args.questions)
+            state.set_staff(queue_id, args.staff)
+        app = fake_queue_server.make_app(state, args.latency, args.error_rate, args.churn)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+
+        bot = queue_bot.bot
+        channels = {
+            ALERT_CHANNEL_BASE + n: FakeAlertChannel(
+                ALERT_CHANNEL_BASE + n, args.discord_latency, injected[queue_id], alert_lags
+            )
+            for n, queue_id in enumerate(queue_ids)
+        }
+        try:
+            # Entering the client sets up its asyncio state without logging in;
+            # with no gateway connection the ready flag has to be set here
+            async with bot:
+                bot._ready.set()
+                bot.get_channel = channels.get
+                queue_bot.roster = queue_bot.load_groups_from_csv(csv_path)
+                queue_bot.monitors.update(queue_bot.load_monitored_queues())
+                for monitor in queue_bot.monitors.values():
+                    monitor.start()
+
+                started_at = time.monotonic()
+                deadline = started_at + args.duration
+                await asyncio.gather(
+                    inject_collisions(queue_bot, state, rows, queue_ids, args, deadline, injected),
+                    *(
+                        run_user(queue_bot, n, args, queue_ids, netids, deadline, latencies, errors)
+                        for n in range(args.users)
+                    ),
+                )
+                elapsed = time.monotonic() - started_at
+                # Give collisions injected near the end one more poll to be alerted
+                await asyncio.sleep(min(args.interval * 1.2, 30) if not args.push else 1)
+
+                for monitor in queue_bot.monitors.values():
+                    for task in (monitor.poll_task, monitor.push_task):
+                        if task is not None:
+                            task.cancel()
+        finally:
+            await runner.cleanup()
+
+    missed = sum(len(pending) for pending in injected.values())
+    return latencies, errors, alert_lags, missed, elapsed, state.stats
+
+
+def report(args, latencies, errors, alert_lags, missed, elapsed, server_stats):
+    total = sum(len(values) for values in latencies.values())
+    print(
+        f"{args.queues} queue(s) x {args.questions} questions, {args.groups} groups, "
+        f"{args.users} users, {'push' if args.push else f'polling every {args.interval}s'}, "
+        f"API latency {args.latency * 1000:.0f}ms, error rate {args.error_rate:.0%}"
+    )
+    print(f"{total} commands in {elapsed:.1f}s ({total / elapsed:.1f}/s), {sum(errors.values())} failed")
+    print(f"{'command':<12} {'count':>7} {'p50':>8} {'p99':>8} {'max':>8}")
+    for name in COMMANDS + ("all",):
+        values = [v for values in latencies.values() for v in values] if name == "all" else latencies[name]
+        print(
+            f"{name:<12} {len(values):>7} {format_seconds(percentile(values, 0.5)):>8} "
+            f"{format_seconds(percentile(values, 0.99)):>8} {format_seconds(max(values, default=None)):>8}"
+        )
+    print(
+        f"Alert lag: {len(alert_lags)} alerted, {missed} missed, "
+        f"p50 {format_seconds(percentile(alert_lags, 0.5))}, p99 {format_seconds(percentile(alert_lags, 0.99))}"
+    )
+    print(
+        f"Queue API: {server_stats['requests']} requests, {server_stats['not_modified']} not modified, "
+        f"{server_stats['errors']} injected errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queues", type=int, default=2, help="queues to monitor (default 2)")
+    parser.add_argument("--questions", type=int, default=150, help="questions per queue (default 150)")
+    parser.add_argument("--groups", type=int, default=1000, help="groups in the roster (default 1000)")
+    parser.add_argument("--staff", type=int, default=6, help="active staff per queue (default 6)")
+    parser.add_argument("--users", type=int, default=50, help="concurrent command users (default 50)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a user's commands")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load (default 30)")
+    parser.add_argument("--interval", type=int, default=5, help="poll interval in seconds (default 5)")
+    parser.add_argument("--push", action="store_true", help="follow the push channel instead of polling")
+    parser.add_argument("--churn", type=float, default=2.0, help="queue changes per second per queue")
+    parser.add_argument("--collision-interval", type=float, default=2.0, help="seconds between injected collisions")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds added to API responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API requests failing with 503")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="seconds per fake Discord send")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # queue_bot reads its configuration at import time
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    os.environ.update({
+        "QUEUE_BASE_URL": base_url,
+        "OH_URL": f"{base_url}/lab.html",
+        "MONITORED_QUEUES": ",".join(
+            f"{n}:{args.interval}:{ALERT_CHANNEL_BASE + n - 1}" for n in range(1, args.queues + 1)
+        ),
+        "DEFAULT_QUEUE_ID": "1",
+        "QUEUE_PUSH": "1" if args.push else "0",
+        "ADAPTIVE_POLLING": "0",
+        "STATE_DB_PATH": "",
+        "HISTORY_DIR": "",
+        "ROSTER_WATCH": "0",
+        "METRICS_PORT": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("LOG_FORMAT", "text")
+
+    import queue_bot
+
+    queue_bot.setup_logging()
+    try:
+        results = asyncio.run(run(args, port))
+    finally:
+        queue_bot.stop_logging()
+    report(args, *results)
+
+
+if __name__ == "__main__":
+    main()
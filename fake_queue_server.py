@@ -0,0 +1,359 @@
+"""
+Local stand-in for queue.illinois.edu, for testing the bot offline.
+
+Serves the REST endpoints the bot uses and a minimal Socket.IO (Engine.IO v4,
+websocket transport only) push channel at /q/socket.io/.
+
+Also serves a synthetic lab.html at /lab.html, and can simulate a busy queue:
+pre-filled questions, background churn (questions added, answered and removed),
+response latency and injected 503 errors on the API routes.
+
+Usage:
+    python fake_queue_server.py --port 8080
+    QUEUE_BASE_URL=http://localhost:8080 OH_URL=http://localhost:8080/lab.html QUEUE_PUSH=1 python queue_bot.py
+
+Peak-load simulation (200 questions, one change per second, 5% errors):
+    python fake_queue_server.py --questions 200 --staff 6 --churn 1 --latency 0.15 --error-rate 0.05
+
+Add or remove questions while the bot is running:
+    curl -X POST localhost:8080/admin/queues/1/questions -d '{"netid": "abc2", "topic": "MP group 3 comp 12"}'
+    curl -X DELETE localhost:8080/admin/queues/1/questions/5
+"""
+
+import argparse
+import asyncio
+import collections
+import csv
+import hashlib
+import itertools
+import json
+import random
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+NAMESPACE = "/queue"
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+STAFF_NAMES = [
+    "Alex", "Bailey", "Casey", "Devon", "Emery", "Finley", "Gray", "Harper",
+    "Indy", "Jordan", "Kai", "Logan", "Morgan", "Noel", "Oakley", "Parker",
+]
+TOPICS = [
+    "MP3 group {group} comp {comp}: page fault in the handler",
+    "[Conceptual] group {group}, computer {comp} - paging question",
+    "mp group{group} comp{comp}",
+    "help with checkpoint 2",
+]
+
+
+def hour_label(hour):
+    if hour <= 11:
+        return f"{hour}am"
+    if hour == 12:
+        return "noon"
+    return f"{hour - 12}pm"
+
+
+def make_lab_html(seed=0, filler_sections=40):
+    """
+    Synthetic stand-in for the course's lab.html: a long page of filler content
+    around a table.week with one row per hour (8am-9pm), staff names per day
+    cell, and lecture blocks on Tue/Thu covered by rowspans.
+    """
+    rng = random.Random(seed)
+    parts = [
+        "<!DOCTYPE html><html><head><title>ECE 391 Lab Schedule</title>",
+        "<link rel='stylesheet' href='style.css'></head><body>",
+        "<div id='nav'><ul>" + "".join(f"<li><a href='p{i}.html'>Page {i}</a></li>" for i in range(20)) + "</ul></div>",
+    ]
+    for section in range(filler_sections // 2):
+        parts.append(f"<h2>Section {section}</h2><p>" + " ".join(rng.choice(STAFF_NAMES) for _ in range(80)) + "</p>")
+        parts.append("<table class='info'>" + "".join(
+            f"<tr><td>{rng.randint(0, 999)}</td><td>note {i}</td></tr>" for i in range(10)
+        ) + "</table>")
+
+    parts.append("<table class='week'><tr><th></th>" + "".join(f"<th>{d}</th>" for d in WEEKDAYS) + "</tr>")
+    for hour in range(8, 22):
+        cells = [f"<td class='rh'>{hour_label(hour)}</td>"]
+        for day in WEEKDAYS:
+            lecture = day in ("tue", "thu") and hour in (11, 12)
+            if lecture and hour == 12:
+                continue  # Covered by the 11am lecture cell's rowspan
+            if lecture:
+                cells.append(f"<td class='{day} lecture' rowspan='2'>Lecture</td>")
+            elif day in ("sat", "sun") and hour > 17:
+                cells.append(f"<td class='{day}'></td>")
+            else:
+                names = rng.sample(STAFF_NAMES, rng.randint(1, 3))
+                cells.append(f"<td class='{day}'>" + "<br>\n".join(names) + "</td>")
+        parts.append("<tr>" + "".join(cells) + "</tr>")
+    parts.append("</table>")
+
+    for section in range(filler_sections // 2, filler_sections):
+        parts.append(f"<h2>Section {section}</h2><p>" + " ".join(rng.choice(STAFF_NAMES) for _ in range(80)) + "</p>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+class FakeQueueState:
+    """In-memory queues plus the websocket subscribers of each queue room"""
+
+    def __init__(self, seed=None, netids=None):
+        self.queues = {}
+        self.subscribers = {}
+        self.next_question_id = itertools.count(1)
+        self.rng = random.Random(seed)
+        self.netids = netids or [f"student{n}" for n in range(1, 501)]
+        self.target_sizes = {}  # queue_id -> queue length the churn hovers around
+        self.stats = collections.Counter()
+
+    def queue(self, queue_id):
+        return self.queues.setdefault(
+            str(queue_id),
+            {"id": int(queue_id) if str(queue_id).isdigit() else queue_id,
+             "name": f"Queue {queue_id}",
+             "activeStaff": [],
+             "questions": {}},
+        )
+
+    def add_question(self, queue_id, netid, topic, name=None):
+        question = {
+            "id": next(self.next_question_id),
+            "topic": topic,
+            "enqueueTime": datetime.now(timezone.utc).isoformat(),
+            "beingAnswered": False,
+            "askedBy": {"netid": netid, "name": name or netid},
+        }
+        self.queue(queue_id)["questions"][question["id"]] = question
+        return question
+
+    def remove_question(self, queue_id, question_id):
+        return self.queue(queue_id)["questions"].pop(question_id, None)
+
+    def random_question(self, queue_id):
+        """Add a question from a random student in the netid pool"""
+        topic = self.rng.choice(TOPICS).format(
+            group=self.rng.randint(1, 200), comp=self.rng.randint(1, 40)
+        )
+        return self.add_question(queue_id, self.rng.choice(self.netids), topic)
+
+    def populate(self, queue_id, size):
+        """Fill a queue with size random questions; churn keeps it near that length"""
+        self.target_sizes[str(queue_id)] = size
+        for _ in range(size):
+            self.random_question(queue_id)
+
+    def set_staff(self, queue_id, count):
+        self.queue(queue_id)["activeStaff"] = [
+            {"user": {"netid": f"ta{n}", "name": STAFF_NAMES[n % len(STAFF_NAMES)]}}
+            for n in range(1, count + 1)
+        ]
+
+    async def churn_step(self, queue_id):
+        """
+        Move a queue one step: add a question, start answering the oldest waiting
+        one, or remove one that was being answered. Adds are favoured below the
+        target length and answers above it, so the length random-walks around it.
+        """
+        queue = self.queue(queue_id)
+        questions = queue["questions"]
+        grow = len(questions) < self.target_sizes.get(str(queue_id), 0)
+        if self.rng.random() < 0.5:
+            grow = not grow
+
+        if grow or not questions:
+            question = self.random_question(queue_id)
+            await self.broadcast(queue_id, "question:create", {"question": question})
+            return
+
+        answering = [q for q in questions.values() if q["beingAnswered"]]
+        if answering and (len(answering) >= max(len(queue["activeStaff"]), 1) or self.rng.random() < 0.5):
+            question = self.rng.choice(answering)
+            self.remove_question(queue_id, question["id"])
+            await self.broadcast(queue_id, "question:delete", {"id": question["id"]})
+            return
+
+        waiting = [q for q in questions.values() if not q["beingAnswered"]]
+        if waiting:
+            staff = self.rng.choice(queue["activeStaff"])["user"] if queue["activeStaff"] else {"netid": "ta0"}
+            question = waiting[0]
+            question["beingAnswered"] = True
+            question["answerStartTime"] = datetime.now(timezone.utc).isoformat()
+            question["answeredBy"] = {"netid": staff["netid"], "name": staff.get("name", staff["netid"])}
+            await self.broadcast(queue_id, "question:update", {"question": question})
+
+    async def run_churn(self, rate):
+        """Apply about rate churn steps per second to every populated queue"""
+        while True:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            for queue_id in list(self.target_sizes):
+                await self.churn_step(queue_id)
+
+    async def broadcast(self, queue_id, event, payload):
+        packet = f"42{NAMESPACE}," + json.dumps([event, payload])
+        for ws in list(self.subscribers.get(str(queue_id), ())):
+            try:
+                await ws.send_str(packet)
+            except ConnectionError:
+                self.subscribers[str(queue_id)].discard(ws)
+
+
+def load_netids(csv_path):
+    """All netids of a groups CSV (header row skipped), for realistic collisions"""
+    with open(csv_path, newline="") as f:
+        rows = csv.reader(f)
+        next(rows, None)
+        return [cell.strip().lower() for row in rows for cell in row if cell.strip()]
+
+
+@web.middleware
+async def fault_injection(request, handler):
+    """Add latency and random 503s to the queue API routes, and count requests"""
+    if not request.path.startswith("/q/api/"):
+        return await handler(request)
+
+    state = request.app["state"]
+    state.stats["requests"] += 1
+    latency = request.app["latency"]
+    if latency:
+        await asyncio.sleep(latency * state.rng.uniform(0.5, 1.5))
+    if state.rng.random() < request.app["error_rate"]:
+        state.stats["errors"] += 1
+        return web.Response(status=503, text="Injected error")
+    response = await handler(request)
+    if response.status == 304:
+        state.stats["not_modified"] += 1
+    return response
+
+
+def json_with_etag(request, data):
+    """Return data as JSON, answering 304 if the client's ETag still matches"""
+    body = json.dumps(data).encode()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers={"ETag": etag})
+    return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+
+async def get_questions(request):
+    state = request.app["state"]
+    queue = state.queue(request.match_info["queue_id"])
+    return json_with_etag(request, list(queue["questions"].values()))
+
+
+async def get_queue(request):
+    state = request.app["state"]
+    queue = state.queue(request.match_info["queue_id"])
+    info = {k: v for k, v in queue.items() if k != "questions"}
+    return json_with_etag(request, info)
+
+
+async def admin_add_question(request):
+    state = request.app["state"]
+    queue_id = request.match_info["queue_id"]
+    body = await request.json()
+    question = state.add_question(queue_id, body["netid"], body.get("topic", ""), body.get("name"))
+    await state.broadcast(queue_id, "question:create", {"question": question})
+    return web.json_response(question, status=201)
+
+
+async def admin_remove_question(request):
+    state = request.app["state"]
+    queue_id = request.match_info["queue_id"]
+    question_id = int(request.match_info["question_id"])
+    if state.remove_question(queue_id, question_id) is None:
+        raise web.HTTPNotFound()
+    await state.broadcast(queue_id, "question:delete", {"id": question_id})
+    return web.Response(status=204)
+
+
+async def socket_endpoint(request):
+    """Minimal Engine.IO v4 / Socket.IO v5 server supporting join and push events"""
+    state = request.app["state"]
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    joined = set()
+
+    await ws.send_str("0" + json.dumps({
+        "sid": hashlib.sha1(str(id(ws)).encode()).hexdigest()[:20],
+        "upgrades": [],
+        "pingInterval": 25000,
+        "pingTimeout": 20000,
+        "maxPayload": 1000000,
+    }))
+
+    async def pinger():
+        while not ws.closed:
+            await asyncio.sleep(25)
+            await ws.send_str("2")
+
+    ping_task = asyncio.create_task(pinger())
+    try:
+        async for msg in ws:
+            if msg.type != web.WSMsgType.TEXT:
+                break
+            packet = msg.data
+            if packet.startswith(f"40{NAMESPACE}"):
+                await ws.send_str(f"40{NAMESPACE}," + json.dumps({"sid": "fake"}))
+            elif packet.startswith(f"42{NAMESPACE},"):
+                event, *args = json.loads(packet[len(f"42{NAMESPACE},"):])
+                if event == "join" and args:
+                    queue_id = str(args[0]["queueId"])
+                    state.subscribers.setdefault(queue_id, set()).add(ws)
+                    joined.add(queue_id)
+    finally:
+        ping_task.cancel()
+        for queue_id in joined:
+            state.subscribers[queue_id].discard(ws)
+    return ws
+
+
+async def get_lab_html(request):
+    return web.Response(text=request.app["lab_html"], content_type="text/html")
+
+
+async def churn_context(app):
+    """Run the state's churn in the background for the app's lifetime"""
+    task = asyncio.create_task(app["state"].run_churn(app["churn"])) if app["churn"] > 0 else None
+    yield
+    if task is not None:
+        task.cancel()
+
+
+def make_app(state=None, latency=0.0, error_rate=0.0, churn=0.0):
+    app = web.Application(middlewares=[fault_injection])
+    app["state"] = state or FakeQueueState()
+    app["latency"] = latency  # Mean seconds added to each API response
+    app["error_rate"] = error_rate  # Fraction of API requests answered with a 503
+    app["churn"] = churn  # Churn steps per second per populated queue
+    app["lab_html"] = make_lab_html()
+    app.cleanup_ctx.append(churn_context)
+    app.router.add_get("/q/api/queues/{queue_id}/questions", get_questions)
+    app.router.add_get("/q/api/queues/{queue_id}", get_queue)
+    app.router.add_post("/admin/queues/{queue_id}/questions", admin_add_question)
+    app.router.add_delete("/admin/queues/{queue_id}/questions/{question_id}", admin_remove_question)
+    app.router.add_get("/q/socket.io/", socket_endpoint)
+    app.router.add_get("/lab.html", get_lab_html)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in queue API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--queues", default="1", help="comma-separated queue IDs to pre-fill")
+    parser.add_argument("--questions", type=int, default=0, help="initial questions per queue")
+    parser.add_argument("--staff", type=int, default=0, help="active staff per queue")
+    parser.add_argument("--groups-csv", help="draw student netids from this groups CSV")
+    parser.add_argument("--churn", type=float, default=0.0, help="queue changes per second per queue")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds added to API responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API requests failing with 503")
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable runs")
+    args = parser.parse_args()
+
+    state = FakeQueueState(args.seed, load_netids(args.groups_csv) if args.groups_csv else None)
+    for queue_id in filter(None, args.queues.split(",")):
+        state.populate(queue_id, args.questions)
+        state.set_staff(queue_id, args.staff)
+    app = make_app(state, latency=args.latency, error_rate=args.error_rate, churn=args.churn)
+    web.run_app(app, host=args.host, port=args.port)
@@ -1,46 +1,771 @@
 import discord
 from discord.ext import commands
-import requests
+import aiohttp
+from aiohttp import web
 import json
 import os
 import csv
+import sqlite3
+import sys
 import asyncio
 from dotenv import load_dotenv
 import re
 import random
+import collections
+import functools
+import hashlib
+import urllib.parse
+import bisect
+import math
+import struct
+import ctypes
+import ctypes.util
+import multiprocessing
+import concurrent.futures
+import concurrent.futures.process
+import time as time_module
+import queue as queue_module
+import logging
+import logging.handlers
+from array import array
 from datetime import datetime, time
 from bs4 import BeautifulSoup
+import html.parser
 from zoneinfo import ZoneInfo
 
+try:
+    import lxml.html  # Optional: enables HTML_PARSER=lxml
+except ImportError:
+    lxml = None
+
 # Load environment variables from .env file
 load_dotenv()
 
 
 # Constants
-DEFAULT_BASE_URL = "https://queue.illinois.edu"
-OH_URL = "https://courses.grainger.illinois.edu/ece391/sp2025/lab.html"
+DEFAULT_BASE_URL = os.getenv("QUEUE_BASE_URL", "https://queue.illinois.edu")
+OH_URL = os.getenv("OH_URL", "https://courses.grainger.illinois.edu/ece391/sp2025/lab.html")
 API_PATH = "/q/api"
 QUEUE_TOKEN = os.getenv("QUEUE_TOKEN", "")
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
 GROUPS_CSV_PATH = os.getenv("GROUPS_CSV_PATH", "groups.csv")
+# Binary snapshot of the parsed roster (default: next to GROUPS_CSV_PATH)
+ROSTER_CACHE_PATH = os.getenv("ROSTER_CACHE_PATH", "")
+# Reload the roster automatically when GROUPS_CSV_PATH changes
+ROSTER_WATCH = os.getenv("ROSTER_WATCH", "1").lower() in ("1", "true", "yes")
+ROSTER_POLL_INTERVAL = int(os.getenv("ROSTER_POLL_INTERVAL", "30"))  # Without inotify
+ROSTER_WATCH_DEBOUNCE = 1.0  # Seconds to let a writer finish before reloading
+# Detector state survives restarts in this SQLite database ("" disables it)
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "queue_bot_state.sqlite3")
+# Every poll is appended to day-partitioned history files here ("" disables it)
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
 CHECK_INTERVAL = int(
     os.getenv("CHECK_INTERVAL", "300")
 )  # Default: check every 5 minutes
+# Adaptive polling: fast while the queue has questions, CHECK_INTERVAL during scheduled
+# office hours, and exponential backoff up to POLL_MAX_INTERVAL while idle off-hours
+ADAPTIVE_POLLING = os.getenv("ADAPTIVE_POLLING", "1").lower() in ("1", "true", "yes")
+POLL_BUSY_INTERVAL = int(os.getenv("POLL_BUSY_INTERVAL", "60"))
+POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", "3600"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))  # +/- fraction of each interval
+# Wait-time estimates for !eta: EWMA weight of each new sample, and the assumed
+# minutes per question until staff have been observed answering
+ETA_EWMA_ALPHA = float(os.getenv("ETA_EWMA_ALPHA", "0.2"))
+ETA_DEFAULT_SERVICE = float(os.getenv("ETA_DEFAULT_SERVICE", "300"))  # Seconds per question
+# Hourly aggregates kept for !queuestats
+STATS_RETENTION_DAYS = int(os.getenv("STATS_RETENTION_DAYS", "30"))
+# Staffed window used by !checkstaff and the adaptive poller
+CAMPUS_TIMEZONE = ZoneInfo("America/Chicago")
+WORKING_HOURS_START = time(8, 0)  # 8:00 AM
+WORKING_HOURS_END = time(22, 0)  # 10:00 PM
+
+# Push mode: follow the queue's socket channel and only poll to reconcile
+QUEUE_PUSH = os.getenv("QUEUE_PUSH", "0").lower() in ("1", "true", "yes")
+QUEUE_SOCKET_URL = os.getenv(
+    "QUEUE_SOCKET_URL", DEFAULT_BASE_URL.replace("http", "ws", 1) + "/q/socket.io/"
+)
+QUEUE_SOCKET_NAMESPACE = "/queue"
+RECONCILE_INTERVAL = int(
+    os.getenv("RECONCILE_INTERVAL", "900")
+)  # Full re-fetch every 15 minutes while push mode is healthy
+# Monitored queues ("id[:interval[:channel]],...") and how many to fetch at once
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "4"))
+
+# Status commands reuse a queue snapshot younger than this many seconds
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "15"))
+# Send command replies as embeds instead of plain messages
+RESPONSE_EMBEDS = os.getenv("RESPONSE_EMBEDS", "0").lower() in ("1", "true", "yes")
+# Discord limits: message content, embed description, total embed text per message
+DISCORD_MESSAGE_LIMIT = 2000
+DISCORD_EMBED_DESCRIPTION_LIMIT = 4096
+DISCORD_EMBED_TOTAL_LIMIT = 6000
+# Outbound message priorities: alerts jump ahead of informational replies
+PRIORITY_ALERT = 0
+PRIORITY_REPLY = 1
+# Office-hours page parser: "fast" (streaming), "lxml" (if installed) or "bs4"
+HTML_PARSER = os.getenv("HTML_PARSER", "fast")
+# How often the office-hours page is re-checked for schedule changes
+SCHEDULE_REFRESH_INTERVAL = int(os.getenv("SCHEDULE_REFRESH_INTERVAL", "3600"))
+
+# Worker pools for CPU-bound parsing, kept off the event loop
+PARSE_THREADS = int(os.getenv("PARSE_THREADS", "2"))
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "1"))  # 0: use threads only
+
+# HTTP client settings (shared by the poller and every command)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # Total seconds per request
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # Max open connections
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "75"))  # Idle keep-alive seconds
+# Commands reuse a fetch that completed less than this many seconds ago
+FRESHNESS_WINDOW = float(os.getenv("FRESHNESS_WINDOW", "10"))
+# Queue API retries (5xx, timeouts, connection errors) and per-host circuit breaker
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))  # Seconds, doubled per retry
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))  # Failed fetches before opening
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "60"))  # Seconds before a trial request
+# Prometheus-style metrics endpoint (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Logging: JSON lines on stdout (and LOG_FILE if set), written by a background thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per-logger overrides, e.g. "queue_bot.http=DEBUG,discord=WARNING"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate LOG_FILE at this size
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "300"))  # Seconds; 0 logs every repeat
+
+log = logging.getLogger("queue_bot")
+http_log = logging.getLogger("queue_bot.http")
+roster_log = logging.getLogger("queue_bot.roster")
+schedule_log = logging.getLogger("queue_bot.schedule")
+monitor_log = logging.getLogger("queue_bot.monitor")
+state_log = logging.getLogger("queue_bot.state")
+history_log = logging.getLogger("queue_bot.history")
+send_log = logging.getLogger("queue_bot.send")
+log_listener = None
+
+# Attributes every LogRecord has; anything else was passed through extra=
+STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop repeats of the same message within a window. The first repeat after
+    the window closes is logged with a "suppressed" count of the ones dropped.
+    """
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.seen = {}  # (logger, level, template, args) -> [window start, suppressed]
+
+    def filter(self, record):
+        if self.window <= 0:
+            return True
+        try:
+            key = (record.name, record.levelno, record.msg, record.args)
+            state = self.seen.get(key)
+        except TypeError:  # Unhashable args
+            key = (record.name, record.levelno, record.msg, repr(record.args))
+            state = self.seen.get(key)
+
+        if state is not None and record.created - state[0] < self.window:
+            state[1] += 1
+            return False
+        if state is not None and state[1]:
+            record.suppressed = state[1]
+        if len(self.seen) > 1000:
+            self.seen = {k: v for k, v in self.seen.items() if record.created - v[0] < self.window}
+        self.seen[key] = [record.created, 0]
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records unformatted so formatting happens on the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging():
+    """
+    Route all logging (including discord.py's) through a queue to a background
+    listener thread that formats records and writes them to stdout and LOG_FILE.
+    """
+    global log_listener
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if LOG_FILE:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue_module.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_WINDOW))
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL.upper())
+    for entry in LOG_LEVELS.split(","):
+        name, _, level = entry.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+
+class QueueBot(commands.Bot):
+    async def close(self):
+        """Close the shared HTTP session, worker pools, metrics server and state store along with the Discord connection"""
+        await stop_metrics_server()
+        if state_store is not None:
+            await state_store.close()
+        if history_store is not None:
+            await history_store.close()
+        await close_http_session()
+        shutdown_worker_pools()
+        await super().close()
+
 
 # Set up Discord bot
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = QueueBot(command_prefix="!", intents=intents)
 
 # Cache for group information
-netid_to_group = {}
-group_to_members = {}
-# Tracking of previously detected groups in queue
-previous_groups_in_queue = {}
+roster = None  # Roster, loaded in on_ready
+# Push mode state: queue_id -> {question id: question}
+live_questions = {}
+# Monitored queues: queue_id -> QueueMonitor
+monitors = {}
+# Bounds how many queues are fetched from the API at the same time
+fetch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+# Outbound send queues: channel id -> ChannelSender
+channel_senders = {}
+# Latest status snapshot per queue, and snapshots currently being built
+queue_snapshots = {}
+inflight_snapshots = {}
+# Compiled office-hours schedule, rebuilt only when lab.html changes
+office_hours_schedule = None
+office_hours_hash = None
+schedule_task = None
+roster_watch_task = None
+# Durable detector state and poll history, opened in on_ready
+state_store = None
+history_store = None
+history_warm_up = None
+# Worker pools, created on first use: "thread" and "process" -> executor
+worker_pools = {}
+worker_pool_limits = {}
+pool_stats = {
+    kind: {"tasks": 0, "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0}
+    for kind in ("thread", "process")
+}
+# Shared HTTP session, created lazily on the running event loop
+http_session = None
+# Conditional GET cache: url -> {"etag", "last_modified", "data", "size", "parse_time"}
+response_cache = {}
+cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "bytes_saved": 0,
+    "parse_seconds_saved": 0.0,
+    "coalesced": 0,
+    "fresh_reuse": 0,
+}
+# Single-flight: (base_url, queue_id, endpoint) -> in-flight fetch task
+inflight_fetches = {}
+# Latest successful fetch: (base_url, queue_id, endpoint) -> (monotonic time, data)
+recent_fetches = {}
+# Circuit breakers: host -> CircuitBreaker
+circuit_breakers = {}
+# Metrics HTTP server, started in on_ready when METRICS_PORT is set
+metrics_runner = None
+
+
+def format_labels(names, values, extra=""):
+    """Render a Prometheus label set such as {endpoint="questions",le="0.5"}"""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter keyed by label values; inc() is a single dict update"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+        metrics_registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, format_labels(self.label_names, labels), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and two increments"""
+
+    kind = "histogram"
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+        metrics_registry.append(self)
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(self.label_names, labels, f'le="{bound}"'), cumulative
+            label_str = format_labels(self.label_names, labels)
+            yield f"{self.name}_sum", label_str, total
+            yield f"{self.name}_count", label_str, cumulative
+
+
+class CollectedMetric:
+    """
+    Gauge or counter whose values are read from existing bot state at scrape time,
+    so keeping it up to date costs nothing between scrapes.
+    collect() returns {label values tuple: value}.
+    """
 
+    def __init__(self, kind, name, help_text, label_names, collect):
+        self.kind = kind
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.collect = collect
+        metrics_registry.append(self)
+
+    def samples(self):
+        for labels, value in self.collect().items():
+            yield self.name, format_labels(self.label_names, labels), value
+
+
+def render_metrics():
+    """Serialize every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in metrics_registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def current_queue_lengths():
+    lengths = {}
+    for queue_id in monitors:
+        if QUEUE_PUSH and queue_id in live_questions:
+            lengths[(queue_id,)] = len(live_questions[queue_id])
+        elif queue_id in queue_snapshots:
+            lengths[(queue_id,)] = len(queue_snapshots[queue_id].questions)
+    return lengths
+
+
+metrics_registry = []
+API_FETCH_SECONDS = Histogram(
+    "queuebot_api_fetch_seconds", "Queue API request latency", ("endpoint",)
+)
+HTML_FETCH_SECONDS = Histogram("queuebot_html_fetch_seconds", "lab.html download time")
+HTML_PARSE_SECONDS = Histogram(
+    "queuebot_html_parse_seconds", "Office-hours schedule parse time, including the worker hand-off"
+)
+GROUP_CHECK_SECONDS = Histogram(
+    "queuebot_group_check_seconds", "Time to check questions for group collisions",
+    ("mode",), buckets=Histogram.FAST_BUCKETS,
+)
+DISCORD_SEND_SECONDS = Histogram(
+    "queuebot_discord_send_seconds", "Time from queueing a Discord message to it being sent", ("priority",)
+)
+ERRORS_TOTAL = Counter("queuebot_errors_total", "Errors by kind", ("kind",))
+ALERTS_SENT_TOTAL = Counter("queuebot_alerts_sent_total", "Group alerts sent", ("queue",))
+CollectedMetric(
+    "counter", "queuebot_cache_hits_total", "Queue API requests answered without a full download", ("kind",),
+    lambda: {
+        ("not_modified",): cache_stats["hits"],
+        ("coalesced",): cache_stats["coalesced"],
+        ("fresh",): cache_stats["fresh_reuse"],
+    },
+)
+CollectedMetric(
+    "gauge", "queuebot_queue_length", "Questions currently in each monitored queue", ("queue",),
+    current_queue_lengths,
+)
+CollectedMetric(
+    "gauge", "queuebot_groups_loaded", "Groups in the loaded roster", (),
+    lambda: {(): len(roster) if roster else 0},
+)
+CollectedMetric(
+    "gauge", "queuebot_send_queue_depth", "Messages waiting in each Discord send queue", ("channel",),
+    lambda: {(key,): sender.depth() for key, sender in channel_senders.items()},
+)
+
+
+async def handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server():
+    """Serve /metrics on METRICS_HOST:METRICS_PORT; metrics are only rendered when scraped"""
+    global metrics_runner
+    if METRICS_PORT <= 0 or metrics_runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    metrics_runner = runner
+    log.info("Serving metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+
+
+async def stop_metrics_server():
+    global metrics_runner
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+        metrics_runner = None
+
+
+def get_http_session():
+    """Return the shared aiohttp session, creating it on first use"""
+    global http_session
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT
+        )
+        http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return http_session
+
+
+def get_worker_pool(kind):
+    """Return the bounded thread or process pool, creating it on first use"""
+    if kind == "process" and PARSE_PROCESSES <= 0:
+        kind = "thread"
+    pool = worker_pools.get(kind)
+    if pool is None:
+        if kind == "process":
+            # spawn, not fork: forking a process with a running event loop is unsafe
+            context = multiprocessing.get_context("spawn")
+            pool = concurrent.futures.ProcessPoolExecutor(PARSE_PROCESSES, mp_context=context)
+            workers = PARSE_PROCESSES
+        else:
+            pool = concurrent.futures.ThreadPoolExecutor(PARSE_THREADS, thread_name_prefix="parse")
+            workers = PARSE_THREADS
+        worker_pools[kind] = pool
+        # Bound the backlog so a burst of work cannot queue up without limit
+        worker_pool_limits[kind] = asyncio.Semaphore(workers * 4)
+    return kind, pool
+
+
+def timed_call(submitted_at, fn, *args):
+    """Run fn in a worker; returns (result, seconds spent waiting for a worker, seconds running)"""
+    started_at = time_module.time()
+    result = fn(*args)
+    return result, started_at - submitted_at, time_module.time() - started_at
+
+
+async def run_in_pool(kind, fn, *args):
+    """
+    Run CPU-bound fn(*args) in the "thread" or "process" pool and return its result.
+    Records how long each task waited for a free worker.
+    """
+    kind, pool = get_worker_pool(kind)
+    loop = asyncio.get_running_loop()
+    submitted_at = time_module.time()
+    try:
+        async with worker_pool_limits[kind]:
+            result, waited, ran = await loop.run_in_executor(
+                pool, timed_call, submitted_at, fn, *args
+            )
+    except concurrent.futures.process.BrokenProcessPool:
+        # A worker died: drop the pool so the next call starts a fresh one
+        log.warning("Process pool broke; retrying in the thread pool")
+        worker_pools.pop("process", None)
+        return await run_in_pool("thread", fn, *args)
+
+    stats = pool_stats[kind]
+    stats["tasks"] += 1
+    stats["wait_total"] += waited
+    stats["wait_max"] = max(stats["wait_max"], waited)
+    stats["run_total"] += ran
+    return result
+
+
+def shutdown_worker_pools():
+    for pool in worker_pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    worker_pools.clear()
+
+
+async def close_http_session():
+    """Close the shared aiohttp session and its pooled connections"""
+    global http_session
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    http_session = None
+
+
+class FetchResult:
+    """
+    Outcome of a queue API fetch. kind is one of:
+    OK (data), EMPTY (an empty list), ERROR (no data) or STALE (the fetch
+    failed and data is the last good response, age seconds old).
+    """
 
-async def get_questions_for_queue(base_url, queue_id, token=None):
-    """Fetch all questions for a specific queue"""
+    OK = "ok"
+    EMPTY = "empty"
+    ERROR = "error"
+    STALE = "stale"
+
+    def __init__(self, kind, data=None, error=None, age=0.0):
+        self.kind = kind
+        self.data = data
+        self.error = error
+        self.age = age
+
+    @classmethod
+    def success(cls, data):
+        return cls(cls.EMPTY if data == [] else cls.OK, data)
+
+    @property
+    def fresh(self):
+        """True if this is a current answer from the API (OK or EMPTY)"""
+        return self.kind in (self.OK, self.EMPTY)
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: after BREAKER_FAILURES consecutive failed fetches the host
+    is skipped for BREAKER_RESET seconds, then a single trial request decides
+    whether to close the breaker again or keep it open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host):
+        self.host = host
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self):
+        if self.state == self.OPEN:
+            if time_module.monotonic() - self.opened_at < BREAKER_RESET:
+                return False
+            self.state = self.HALF_OPEN
+            return True
+        # While half-open only the trial request may go through
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= BREAKER_FAILURES:
+            if self.state != self.OPEN:
+                self.trips += 1
+                http_log.warning("Circuit open for %s after %d failures", self.host, self.failures)
+            self.state = self.OPEN
+            self.opened_at = time_module.monotonic()
+
+
+def circuit_breaker_for(url):
+    host = urllib.parse.urlsplit(url).netloc
+    breaker = circuit_breakers.get(host)
+    if breaker is None:
+        breaker = circuit_breakers[host] = CircuitBreaker(host)
+    return breaker
+
+
+async def fetch_json(url, headers=None, endpoint="other"):
+    """
+    GET a JSON document through the host's circuit breaker, retrying 5xx
+    responses, timeouts and connection errors with jittered exponential backoff.
+    Returns a FetchResult (OK, EMPTY or ERROR).
+    """
+    breaker = circuit_breaker_for(url)
+    if not breaker.allow():
+        ERRORS_TOTAL.inc("circuit_open")
+        return FetchResult(FetchResult.ERROR, error=f"circuit open for {breaker.host}")
+
+    for attempt in range(HTTP_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * 2 ** (attempt - 1)))
+        started_at = time_module.perf_counter()
+        try:
+            status, data = await revalidate_json(url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            ERRORS_TOTAL.inc("api_exception")
+            error = f"{type(e).__name__}: {e}"
+            continue
+        finally:
+            API_FETCH_SECONDS.observe(time_module.perf_counter() - started_at, endpoint)
+
+        if data is not None:
+            breaker.record_success()
+            return FetchResult.success(data)
+        error = f"HTTP {status}"
+        if status < 500 and status != 429:
+            # The host answered; a 4xx will not go away by retrying
+            breaker.record_success()
+            return FetchResult(FetchResult.ERROR, error=error)
+
+    breaker.record_failure()
+    return FetchResult(FetchResult.ERROR, error=error)
+
+
+async def revalidate_json(url, headers=None):
+    """Conditional GET behind fetch_json, serving 304s from response_cache"""
+    request_headers = dict(headers or {})
+    cached = response_cache.get(url)
+    if cached:
+        if cached["etag"]:
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+    session = get_http_session()
+    async with session.get(url, headers=request_headers) as response:
+        if response.status == 304 and cached:
+            cache_stats["hits"] += 1
+            cache_stats["bytes_saved"] += cached["size"]
+            cache_stats["parse_seconds_saved"] += cached["parse_time"]
+            return 304, cached["data"]
+        if response.status != 200:
+            ERRORS_TOTAL.inc("api_status")
+            return response.status, None
+
+        body = await response.read()
+        parse_start = time_module.perf_counter()
+        data = json.loads(body)
+        parse_time = time_module.perf_counter() - parse_start
+        cache_stats["misses"] += 1
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            response_cache[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "data": data,
+                "size": len(body),
+                "parse_time": parse_time,
+            }
+        else:
+            response_cache.pop(url, None)
+        return 200, data
+
+
+async def coalesced_fetch_json(key, url, headers=None, max_age=FRESHNESS_WINDOW):
+    """
+    Fetch JSON for a (base_url, queue_id, endpoint) key, sharing work between callers.
+    Concurrent callers await the same in-flight request, and a result younger
+    than max_age seconds is returned without contacting the API at all.
+    If the fetch fails, the last good result is returned as STALE.
+    """
+    recent = recent_fetches.get(key)
+    if recent and max_age > 0 and time_module.monotonic() - recent[0] <= max_age:
+        cache_stats["fresh_reuse"] += 1
+        return FetchResult.success(recent[1])
+
+    task = inflight_fetches.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch_json(url, headers, key[2]))
+        inflight_fetches[key] = task
+
+        def on_done(done_task):
+            inflight_fetches.pop(key, None)
+            if not done_task.cancelled() and done_task.exception() is None:
+                result = done_task.result()
+                if result.fresh:
+                    recent_fetches[key] = (time_module.monotonic(), result.data)
+
+        task.add_done_callback(on_done)
+    else:
+        cache_stats["coalesced"] += 1
+
+    # Shield so one caller being cancelled does not cancel the shared fetch
+    result = await asyncio.shield(task)
+    if not result.fresh and key in recent_fetches:
+        fetched_at, data = recent_fetches[key]
+        return FetchResult(FetchResult.STALE, data, result.error, time_module.monotonic() - fetched_at)
+    return result
+
+
+async def get_questions_for_queue(base_url, queue_id, token=None, max_age=FRESHNESS_WINDOW):
+    """Fetch all questions for a specific queue; returns a FetchResult"""
     # Set up the authentication
     headers = {}
     if token:
@@ -49,34 +774,33 @@ async def get_questions_for_queue(base_url, queue_id, token=None):
     url = f"{base_url}{API_PATH}/queues/{queue_id}/questions"
 
     try:
-        response = await asyncio.to_thread(requests.get, url, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(
-                f"Error fetching questions for queue {queue_id}: {response.status_code}"
-            )
-            return []
+        result = await coalesced_fetch_json(
+            (base_url, queue_id, "questions"), url, headers, max_age
+        )
     except Exception as e:
-        print(f"Exception in get_questions_for_queue: {str(e)}")
-        return []
-
-async def get_queue_info(base_url, queue_id, token=None):
+        http_log.error("Exception in get_questions_for_queue: %s", e, extra={"queue": queue_id})
+        return FetchResult(FetchResult.ERROR, error=str(e))
+    if not result.fresh:
+        http_log.warning("Error fetching questions for queue %s: %s", queue_id, result.error, extra={"queue": queue_id})
+    return result
+
+async def get_queue_info(base_url, queue_id, token=None, max_age=FRESHNESS_WINDOW):
+    """Fetch queue metadata (including activeStaff) for a specific queue; returns a FetchResult"""
     headers = {}
     if token:
         headers["Private-Token"] = token
     
     url = f"{base_url}{API_PATH}/queues/{queue_id}"
     try:
-        response = await asyncio.to_thread(requests.get, url, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Error fetching queue info for queue {queue_id}: {response.status_code}")
-            return []
+        result = await coalesced_fetch_json(
+            (base_url, queue_id, "info"), url, headers, max_age
+        )
     except Exception as e:
-        print(f"Exception in get_queue_info: {str(e)}")
-        return []
+        http_log.error("Exception in get_queue_info: %s", e, extra={"queue": queue_id})
+        return FetchResult(FetchResult.ERROR, error=str(e))
+    if not result.fresh:
+        http_log.warning("Error fetching queue info for queue %s: %s", queue_id, result.error, extra={"queue": queue_id})
+    return result
 
 def extract_netid(question):
     """Extract NetID from a question JSON object"""
@@ -90,17 +814,137 @@ def extract_netid(question):
             return question["askedBy"]["netid"]
         return None
     except Exception as e:
-        print(f"Error extracting NetID: {str(e)}")
+        log.warning("Error extracting NetID: %s", e)
         return None
 
 
+class Roster:
+    """
+    Compact, integer-indexed group roster.
+    NetIDs are interned as one sorted UTF-8 blob plus an offsets array, so a
+    netid's dense id is its rank and is found with bisect. Each group's members
+    are a slice of one flat array of netid ids, and the netid -> group mapping
+    is an array indexed by netid id, so no per-netid Python objects are kept.
+    """
+
+    def __init__(self):
+        self.netid_blob = b""  # Every netid, UTF-8, sorted, back to back
+        self.netid_offsets = array("I", [0])  # netid id -> start in netid_blob
+        self.netid_groups = array("i")  # netid id -> group index (-1 if none)
+        self.group_numbers = array("I")  # group index -> N in "Group N" (ascending)
+        self.group_offsets = array("I", [0])  # group index -> start of its members
+        self.group_members = array("I")  # netid ids of every group, back to back
+
+    @classmethod
+    def from_groups(cls, groups):
+        """
+        Build a roster from (group number, netids) pairs in ascending group order.
+        A netid listed in several groups maps to the last one.
+        """
+        roster = cls()
+        netids = sorted({netid for _, members in groups for netid in members})
+        netid_ids = {netid: netid_id for netid_id, netid in enumerate(netids)}  # Only while building
+        encoded = [netid.encode() for netid in netids]
+        roster.netid_blob = b"".join(encoded)
+        offsets = [0]
+        for netid in encoded:
+            offsets.append(offsets[-1] + len(netid))
+        roster.netid_offsets = array("I", offsets)
+
+        netid_groups = [-1] * len(netids)
+        group_members = []
+        for group_index, (group_number, members) in enumerate(groups):
+            for netid in members:
+                netid_id = netid_ids[netid]
+                group_members.append(netid_id)
+                netid_groups[netid_id] = group_index
+            roster.group_offsets.append(len(group_members))
+        roster.netid_groups = array("i", netid_groups)
+        roster.group_numbers = array("I", [group_number for group_number, _ in groups])
+        roster.group_members = array("I", group_members)
+        return roster
+
+    def __len__(self):
+        return len(self.group_numbers)
+
+    def netid_count(self):
+        return len(self.netid_groups)
+
+    def netid_bytes(self, netid_id):
+        return self.netid_blob[self.netid_offsets[netid_id]:self.netid_offsets[netid_id + 1]]
+
+    def netid(self, netid_id):
+        return self.netid_bytes(netid_id).decode()
+
+    def netid_id(self, netid):
+        """Dense id of a netid, or -1 if it is not in the roster"""
+        key = netid.encode()
+        blob, offsets = self.netid_blob, self.netid_offsets
+        low, high = 0, len(offsets) - 1
+        while low < high:  # bisect_left over the blob, without slicing a key per probe
+            mid = (low + high) // 2
+            if blob[offsets[mid]:offsets[mid + 1]] < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(offsets) - 1 and blob[offsets[low]:offsets[low + 1]] == key:
+            return low
+        return -1
+
+    def group_index(self, netid):
+        """Group index of a netid, or -1 if it is not in any group"""
+        netid_id = self.netid_id(netid)
+        if netid_id < 0:
+            return -1
+        return self.netid_groups[netid_id]
+
+    def group_id(self, group_index):
+        return f"Group {self.group_numbers[group_index]}"
+
+    def group_index_of(self, group_id):
+        """Group index for a "Group N" id, or -1 if there is no such group"""
+        try:
+            group_number = int(str(group_id).rsplit(" ", 1)[-1])
+        except ValueError:
+            return -1
+        group_index = bisect.bisect_left(self.group_numbers, group_number)
+        if group_index < len(self.group_numbers) and self.group_numbers[group_index] == group_number:
+            return group_index
+        return -1
+
+    def member_ids(self, group_index):
+        return self.group_members[self.group_offsets[group_index]:self.group_offsets[group_index + 1]]
+
+    def members(self, group_id):
+        """NetIDs of a group by its "Group N" id, in CSV order"""
+        group_index = self.group_index_of(group_id)
+        if group_index < 0:
+            return []
+        return [self.netid(netid_id) for netid_id in self.member_ids(group_index)]
+
+    def nbytes(self):
+        """Approximate memory held by the roster's blob and arrays"""
+        arrays = (self.netid_offsets, self.netid_groups, self.group_numbers, self.group_offsets, self.group_members)
+        return len(self.netid_blob) + sum(a.itemsize * len(a) for a in arrays)
+
+
 def load_groups_from_csv(csv_file_path):
     """
     Load group information from a CSV file.
-    Returns a dictionary mapping netids to their group information.
+    Returns a Roster mapping netids to their groups.
+    """
+    roster, error = parse_groups_csv(csv_file_path)
+    if error:
+        roster_log.error("Error loading groups from CSV: %s", error)
+    return roster
+
+
+def parse_groups_csv(csv_file_path):
+    """
+    Parse a groups CSV without logging, so it can run in a worker process.
+    Returns (roster, error message or None); the roster holds whatever was read.
     """
-    netid_to_group = {}
-    group_to_members = {}
+    groups = []
 
     try:
         with open(csv_file_path, "r") as csvfile:
@@ -111,172 +955,1844 @@ def load_groups_from_csv(csv_file_path):
 
             # Process each row (group)
             for group_idx, row in enumerate(csv_reader, 1):
-                group_id = f"Group {group_idx}"
-                members = []
-
-                # Extract non-empty netids from the row
-                for cell in row:
-                    if cell.strip():  # Check if the cell is not empty
-                        netid = cell.strip().lower()  # Normalize to lowercase
-                        members.append(netid)
-                        netid_to_group[netid] = group_id
+                # Extract non-empty netids from the row, normalized to lowercase
+                members = [cell.strip().lower() for cell in row if cell.strip()]
 
                 if members:  # Only add the group if it has members
-                    group_to_members[group_id] = members
+                    groups.append((group_idx, members))
 
     except Exception as e:
-        print(f"Error loading groups from CSV: {str(e)}")
+        return Roster.from_groups(groups), str(e)
+
+    return Roster.from_groups(groups), None
+
+
+ROSTER_SNAPSHOT_MAGIC = b"QBROSTER3\n"
+ROSTER_SNAPSHOT_ARRAYS = ("netid_offsets", "netid_groups", "group_numbers", "group_offsets", "group_members")
+
+
+def roster_cache_path(csv_file_path):
+    """
+    Snapshot path for the configured groups CSV, or None for any other path:
+    !reloadgroups can name arbitrary files, and must not write next to them.
+    """
+    if os.path.abspath(csv_file_path) != os.path.abspath(GROUPS_CSV_PATH):
+        return None
+    return ROSTER_CACHE_PATH or f"{GROUPS_CSV_PATH}.cache"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_roster_snapshot(roster, snapshot_path, source_key):
+    """
+    Write the roster to a binary snapshot: a magic line, a JSON header with the
+    source CSV's key and array layout, the netid blob, then the raw arrays.
+    """
+    header = dict(source_key)
+    header["byteorder"] = sys.byteorder
+    header["blob"] = len(roster.netid_blob)
+    header["arrays"] = {
+        name: [getattr(roster, name).typecode, len(getattr(roster, name))]
+        for name in ROSTER_SNAPSHOT_ARRAYS
+    }
+
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(ROSTER_SNAPSHOT_MAGIC)
+        f.write(json.dumps(header).encode() + b"\n")
+        f.write(roster.netid_blob)
+        for name in ROSTER_SNAPSHOT_ARRAYS:
+            getattr(roster, name).tofile(f)
+    os.replace(temp_path, snapshot_path)
+
+
+def load_roster_snapshot(snapshot_path):
+    """Read a roster snapshot. Returns (source_key, roster), or None if unusable."""
+    try:
+        with open(snapshot_path, "rb") as f:
+            if f.readline() != ROSTER_SNAPSHOT_MAGIC:
+                return None
+            header = json.loads(f.readline())
+            if header["byteorder"] != sys.byteorder:
+                return None
+
+            roster = Roster()
+            roster.netid_blob = f.read(header["blob"])
+            if len(roster.netid_blob) != header["blob"]:
+                return None
+            for name in ROSTER_SNAPSHOT_ARRAYS:
+                typecode, length = header["arrays"][name]
+                buffer = array(typecode)
+                buffer.fromfile(f, length)
+                setattr(roster, name, buffer)
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return None
+    offsets = roster.netid_offsets
+    if len(offsets) != len(roster.netid_groups) + 1 or offsets[0] != 0 or offsets[-1] != len(roster.netid_blob):
+        return None
+
+    source_key = {key: header[key] for key in ("mtime_ns", "size", "sha256")}
+    return source_key, roster
+
+
+def load_cached_roster(csv_file_path, snapshot_path):
+    """
+    Check the CSV against its binary snapshot (cheap: runs on a thread).
+    Returns (roster, source_key): roster is the snapshot's if it is still valid,
+    otherwise None; source_key is set when a new snapshot should be written.
+    The snapshot is valid when the CSV's mtime and size match, or when its
+    content hash matches.
+    """
+    try:
+        stat = os.stat(csv_file_path)
+    except OSError:
+        return None, None  # Parsing reports the error
+
+    cached = load_roster_snapshot(snapshot_path)
+    if cached:
+        cached_key, cached_roster = cached
+        if cached_key["mtime_ns"] == stat.st_mtime_ns and cached_key["size"] == stat.st_size:
+            return cached_roster, None
+
+    try:
+        sha256 = file_sha256(csv_file_path)
+    except OSError:
+        return None, None  # Unreadable (a directory, no permission): parsing reports the error
+    source_key = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+    if cached and cached[0]["sha256"] == source_key["sha256"]:
+        return cached[1], source_key  # Touched but unchanged: keep the snapshot, refresh its key
+    return None, source_key
+
+
+async def load_roster(csv_file_path):
+    """
+    Load the roster, preferring the binary snapshot of a previous parse.
+    Only a real CSV parse goes to the process pool; the snapshot is read on a
+    thread, and errors are logged here rather than in the worker. Only the
+    configured groups CSV is snapshotted; other paths are always parsed.
+    """
+    roster, source_key = None, None
+    snapshot_path = roster_cache_path(csv_file_path)
+    if snapshot_path:
+        roster, source_key = await run_in_pool("thread", load_cached_roster, csv_file_path, snapshot_path)
+    if roster is None:
+        roster, error = await run_in_pool("process", parse_groups_csv, csv_file_path)
+        if error:
+            # Never snapshot a failed parse: it would be trusted on the next start
+            roster_log.error("Error loading groups from CSV: %s", error)
+            return roster
+
+    if source_key is not None:
+        try:
+            await run_in_pool("thread", save_roster_snapshot, roster, snapshot_path, source_key)
+        except OSError as e:
+            roster_log.warning("Error writing roster snapshot %s: %s", snapshot_path, e)
+    return roster
+
+
+def diff_rosters(old_roster, new_roster):
+    """Return (added, removed, changed) group ids between two rosters"""
+    def groups(roster):
+        if not roster:
+            return {}
+        return {
+            roster.group_id(group_index): tuple(
+                roster.netid(netid_id) for netid_id in roster.member_ids(group_index)
+            )
+            for group_index in range(len(roster))
+        }
+
+    old_groups = groups(old_roster)
+    new_groups = groups(new_roster)
+    added = [group_id for group_id in new_groups if group_id not in old_groups]
+    removed = [group_id for group_id in old_groups if group_id not in new_groups]
+    changed = [
+        group_id for group_id, members in new_groups.items()
+        if group_id in old_groups and old_groups[group_id] != members
+    ]
+    return added, removed, changed
+
+
+async def reload_roster(csv_file_path):
+    """
+    Load the CSV (from its snapshot if unchanged), then swap the new roster in and
+    re-key every queue's detector. Returns a one-line summary of what changed.
+    """
+    global roster
+
+    old_roster = roster
+    new_roster = await load_roster(csv_file_path)
+    if not new_roster and old_roster:
+        return f"Loaded no groups from {csv_file_path}; keeping the current {len(old_roster)} groups."
+
+    added, removed, changed = await run_in_pool("thread", diff_rosters, old_roster, new_roster)
+
+    # Single assignment on the loop thread: readers see either roster, never a mix
+    roster = new_roster
+    for monitor in monitors.values():
+        monitor.detector.set_roster(new_roster)
+
+    return (
+        f"Loaded {len(new_roster)} groups from {csv_file_path} "
+        f"({len(added)} added, {len(removed)} removed, {len(changed)} changed)."
+    )
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None if it cannot be read"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
-    return netid_to_group, group_to_members
+class InotifyWatcher:
+    """
+    Minimal inotify wrapper (Linux only). Watches the file's directory, so editors
+    that save by renaming a temporary file are noticed too, and sets an
+    asyncio.Event whenever an event names the file.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+        self.name = os.path.basename(path).encode()
+        self.changed = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.fd, self.on_readable)
+
+    def on_readable(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + 16 <= len(data):
+            _, _, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if name == self.name:
+                self.changed.set()
 
+    async def wait(self):
+        await self.changed.wait()
+        self.changed.clear()
 
-def check_group_members_in_queue(netids, netid_to_group, group_to_members):
+    def close(self):
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+async def watch_roster_file(csv_file_path):
+    """Background task that reloads the roster whenever the CSV changes"""
+    await bot.wait_until_ready()
+
+    watcher = None
+    if sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(csv_file_path)
+        except (OSError, AttributeError) as e:
+            roster_log.info("inotify unavailable (%s); polling %s every %ss", e, csv_file_path, ROSTER_POLL_INTERVAL)
+
+    last_signature = file_signature(csv_file_path)
+    try:
+        while not bot.is_closed():
+            if watcher:
+                await watcher.wait()
+            else:
+                await asyncio.sleep(ROSTER_POLL_INTERVAL)
+
+            # Let the writer finish; later events in this window are folded in
+            await asyncio.sleep(ROSTER_WATCH_DEBOUNCE)
+            if watcher:
+                watcher.changed.clear()
+
+            signature = file_signature(csv_file_path)
+            if signature is None or signature == last_signature:
+                continue
+            last_signature = signature
+
+            try:
+                roster_log.info(await reload_roster(csv_file_path))
+            except Exception as e:
+                roster_log.error("Error reloading groups from %s: %s", csv_file_path, e)
+    finally:
+        if watcher:
+            watcher.close()
+
+
+def check_group_members_in_queue(netids, roster):
     """
     Check if multiple members of the same group are in the queue.
     Returns a dictionary of groups with multiple members in the queue.
     """
-    group_count = {}
-    groups_with_multiple_members = {}
+    members_by_group = {}
 
     for netid in netids:
-        if netid in netid_to_group:
-            group_id = netid_to_group[netid]
-            group_count[group_id] = group_count.get(group_id, 0) + 1
-
-            # If this is the first member of this group we've seen, initialize the list
-            if group_id not in groups_with_multiple_members:
-                groups_with_multiple_members[group_id] = []
-
-            # Add this member to the list
-            groups_with_multiple_members[group_id].append(netid)
+        group_index = roster.group_index(netid)
+        if group_index >= 0:
+            members_by_group.setdefault(group_index, []).append(netid)
 
     # Filter out groups with only one member in the queue
     return {
-        group_id: members
-        for group_id, members in groups_with_multiple_members.items()
+        roster.group_id(group_index): members
+        for group_index, members in members_by_group.items()
         if len(members) > 1
     }
 
 
-def format_groups_message(groups_in_queue, group_to_members):
+class GroupCollisionDetector:
+    """
+    Incrementally tracks which group members are currently in the queue.
+    Adding or removing a question is O(1); sync() turns a full question list
+    into add/remove deltas so polling and push updates share the same state.
+    """
+
+    def __init__(self, roster=None):
+        self.roster = roster if roster is not None else Roster()
+        self.question_netids = {}  # question id -> netid
+        self.group_members = {}  # group index -> {netid: number of open questions}
+        self.colliding = set()  # group indexes with two or more distinct members queued
+
+    def set_roster(self, roster):
+        """Switch to a new roster, re-grouping the questions already tracked"""
+        self.roster = roster
+        self.group_members = {}
+        self.colliding = set()
+        for question_id, netid in list(self.question_netids.items()):
+            del self.question_netids[question_id]
+            self.question_added(question_id, netid)
+
+    def question_added(self, question_id, netid):
+        """
+        Record a question. Returns (group_id, members_in_queue) if this creates a new
+        collision or adds a new member to an existing one, otherwise None.
+        """
+        if question_id in self.question_netids:
+            self.question_removed(question_id)
+        self.question_netids[question_id] = netid
+
+        group_index = self.roster.group_index(netid)
+        if group_index < 0:
+            return None
+        members = self.group_members.setdefault(group_index, {})
+        is_new_member = netid not in members
+        members[netid] = members.get(netid, 0) + 1
+
+        if is_new_member and len(members) > 1:
+            self.colliding.add(group_index)
+            return self.roster.group_id(group_index), list(members)
+        return None
+
+    def restore(self, question_netids):
+        """Reload tracked questions saved before a restart, without reporting collisions"""
+        for question_id, netid in question_netids.items():
+            self.question_added(question_id, netid)
+
+    def question_removed(self, question_id):
+        """Forget a question that left the queue"""
+        netid = self.question_netids.pop(question_id, None)
+        if netid is None:
+            return
+        group_index = self.roster.group_index(netid)
+        members = self.group_members.get(group_index)
+        if not members or netid not in members:
+            return
+
+        members[netid] -= 1
+        if members[netid] == 0:
+            del members[netid]
+            if len(members) < 2:
+                self.colliding.discard(group_index)
+            if not members:
+                del self.group_members[group_index]
+
+    def sync(self, questions):
+        """
+        Apply the difference between the tracked questions and a full question list.
+        Returns a dictionary of groups with new collisions, like check_group_members_in_queue.
+        """
+        current = {}
+        for question in questions:
+            netid = extract_netid(question)
+            if netid and "id" in question:
+                current[question["id"]] = netid
+
+        for question_id, netid in list(self.question_netids.items()):
+            if current.get(question_id) != netid:
+                self.question_removed(question_id)
+
+        new_groups = {}
+        for question_id, netid in current.items():
+            if question_id not in self.question_netids:
+                collision = self.question_added(question_id, netid)
+                if collision:
+                    group_id, members = collision
+                    new_groups[group_id] = members
+        return new_groups
+
+    def collisions(self):
+        """Return every group that currently has multiple members in the queue"""
+        return {
+            self.roster.group_id(group_index): list(self.group_members[group_index])
+            for group_index in self.colliding
+        }
+
+
+class DetectorStateStore:
+    """
+    Durable copy of each queue's tracked questions in SQLite (WAL mode), so a
+    restart does not re-alert groups that are already in the queue.
+    All database work runs on one dedicated thread. checkpoint() only hands
+    the latest state over, and writes are coalesced and stored as deltas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="state")
+        self.connection = None  # Opened on the state thread
+        self.saved = {}  # queue_id -> {question id: netid} as last written (state thread only)
+        self.submitted = {}  # queue_id -> state last handed to the state thread
+        self.pending = {}  # queue_id -> state waiting for the next write
+        self.writing = None  # Future of the write in progress
+        self.writes = 0
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS detector_questions ("
+                "queue_id TEXT NOT NULL, question_id NOT NULL, netid TEXT NOT NULL, "
+                "PRIMARY KEY (queue_id, question_id)) WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS detector_checkpoints ("
+                "queue_id TEXT PRIMARY KEY, saved_at REAL NOT NULL)"
+            )
+            self.connection.commit()
+        return self.connection
+
+    def read_all(self):
+        """Load every queue's saved questions (state thread)"""
+        rows = self.connect().execute("SELECT queue_id, question_id, netid FROM detector_questions")
+        states = {}
+        for queue_id, question_id, netid in rows:
+            states.setdefault(queue_id, {})[question_id] = netid
+        self.saved = {queue_id: dict(state) for queue_id, state in states.items()}
+        return states
+
+    def write(self, batch):
+        """Write the difference between each queue's saved and latest state (state thread)"""
+        connection = self.connect()
+        now = time_module.time()
+        with connection:
+            for queue_id, state in batch.items():
+                saved = self.saved.get(queue_id, {})
+                removed = [(queue_id, question_id) for question_id in saved if question_id not in state]
+                added = [
+                    (queue_id, question_id, netid)
+                    for question_id, netid in state.items()
+                    if saved.get(question_id) != netid
+                ]
+                connection.executemany(
+                    "DELETE FROM detector_questions WHERE queue_id = ? AND question_id = ?", removed
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO detector_questions VALUES (?, ?, ?)", added
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO detector_checkpoints VALUES (?, ?)", (queue_id, now)
+                )
+                self.saved[queue_id] = state
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        states = await loop.run_in_executor(self.executor, self.read_all)
+        self.submitted = {queue_id: dict(state) for queue_id, state in states.items()}
+        return states
+
+    def checkpoint(self, queue_id, question_netids):
+        """Queue the detector's current questions for writing; never blocks"""
+        if self.submitted.get(queue_id) == question_netids:
+            return
+        state = dict(question_netids)
+        self.submitted[queue_id] = state
+        self.pending[queue_id] = state
+        if self.writing is None:
+            self.start_write()
+
+    def start_write(self):
+        batch, self.pending = self.pending, {}
+        loop = asyncio.get_running_loop()
+        self.writing = loop.run_in_executor(self.executor, self.write, batch)
+        self.writing.add_done_callback(self.write_done)
+
+    def write_done(self, future):
+        self.writing = None
+        self.writes += 1
+        if not future.cancelled() and future.exception() is not None:
+            ERRORS_TOTAL.inc("state_write")
+            state_log.error("Error saving detector state to %s: %s", self.path, future.exception())
+        if self.pending:
+            self.start_write()
+
+    async def close(self):
+        """Write anything still pending and close the database"""
+        while self.writing is not None or self.pending:
+            if self.writing is None:
+                self.start_write()
+            try:
+                await asyncio.shield(self.writing)
+            except Exception:
+                pass  # Already logged by write_done
+            await asyncio.sleep(0)  # Let write_done run
+        loop = asyncio.get_running_loop()
+        if self.connection is not None:
+            await loop.run_in_executor(self.executor, self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=False)
+
+
+HISTORY_MAGIC = b"QBHIST2\n"
+HISTORY_MAGIC_V1 = b"QBHIST1\n"  # No question times; read, and rewritten on append
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_string(text, out):
+    raw = text.encode("utf-8")
+    encode_varint(len(raw), out)
+    out += raw
+
+
+def decode_string(data, pos):
+    length, pos = decode_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+
+def encode_optional(value, out):
+    encode_varint(0 if value is None else value + 1, out)
+
+
+def decode_optional(data, pos):
+    value, pos = decode_varint(data, pos)
+    return (value - 1 if value else None), pos
+
+
+class HistoryRecord:
+    """
+    One poll of a queue: questions maps question id -> (netid, topic,
+    enqueued_ms, answer_started_ms). The times are the wait-time estimator's,
+    in epoch milliseconds; either is None if unknown (answer_started_ms while
+    the question is still waiting, both in QBHIST1 files).
+    """
+
+    def __init__(self, timestamp, questions, staff_count):
+        self.timestamp = timestamp
+        self.questions = questions
+        self.staff_count = staff_count  # None if queue info was unavailable
+
+    @property
+    def length(self):
+        return len(self.questions)
+
+    @property
+    def question_ids(self):
+        return list(self.questions)
+
+    @property
+    def netids(self):
+        return [question[0] for question in self.questions.values()]
+
+    @property
+    def topics(self):
+        return [question[1] for question in self.questions.values()]
+
+
+def iter_history_frames(data):
+    """
+    Decode a history file's bytes lazily. Yields (timestamp_ms, questions,
+    staff_count, end offset) per intact record; a torn record at the end (e.g.
+    from a crash mid-write) stops the iteration. questions is one working dict
+    updated in place, so copy it if it must outlive the next step.
+    """
+    if data.startswith(HISTORY_MAGIC):
+        has_times = True
+    elif data.startswith(HISTORY_MAGIC_V1):
+        has_times = False
+    else:
+        return
+    try:
+        timestamp_ms, pos = decode_varint(data, len(HISTORY_MAGIC))
+    except IndexError:
+        return  # Torn header
+    questions = {}
+
+    while pos < len(data):
+        try:
+            frame_length, start = decode_varint(data, pos)
+            end = start + frame_length
+            if end > len(data):
+                break
+            delta_ms, p = decode_varint(data, start)
+            staff_plus_one, p = decode_varint(data, p)
+            removed_count, p = decode_varint(data, p)
+            question_id = 0
+            for _ in range(removed_count):
+                id_delta, p = decode_varint(data, p)
+                question_id += id_delta
+                questions.pop(question_id, None)
+            added_count, p = decode_varint(data, p)
+            question_id = 0
+            for _ in range(added_count):
+                id_delta, p = decode_varint(data, p)
+                question_id += id_delta
+                netid, p = decode_string(data, p)
+                topic, p = decode_string(data, p)
+                enqueued_ms = answer_started_ms = None
+                if has_times:
+                    enqueued_ms, p = decode_optional(data, p)
+                    answer_started_ms, p = decode_optional(data, p)
+                questions[question_id] = (netid, topic, enqueued_ms, answer_started_ms)
+        except (IndexError, UnicodeDecodeError):
+            break
+        timestamp_ms += delta_ms
+        staff_count = staff_plus_one - 1 if staff_plus_one else None
+        yield timestamp_ms, questions, staff_count, end
+        pos = end
+
+
+def has_history_magic(path):
+    """True if a history file is in the current format"""
+    with open(path, "rb") as f:
+        return f.read(len(HISTORY_MAGIC)) == HISTORY_MAGIC
+
+
+def read_history_partition(path):
+    """
+    Decode one history file. Returns (records, valid_length); a torn record at
+    the end (e.g. from a crash mid-write) is ignored.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith((HISTORY_MAGIC, HISTORY_MAGIC_V1)):
+        return [], 0
+    try:
+        _, valid_length = decode_varint(data, len(HISTORY_MAGIC))
+    except IndexError:
+        return [], 0  # Torn header: the next writer starts the file over
+    records = []
+    for timestamp_ms, questions, staff_count, end in iter_history_frames(data):
+        records.append(HistoryRecord(timestamp_ms / 1000, dict(questions), staff_count))
+        valid_length = end
+    return records, valid_length
+
+
+class HistoryPartitionWriter:
+    """Append handle for the current day's file of one queue, plus the state it encodes against"""
+
+    def __init__(self, path):
+        self.path = path
+        self.questions = {}
+        self.timestamp_ms = None
+        records = []
+        if os.path.exists(path):
+            records, valid_length = read_history_partition(path)
+        if records and not has_history_magic(path):
+            # An older format: re-encode the day so far, then append to that
+            self.file = open(f"{path}.tmp", "wb")
+            for record in records:
+                self.append(round(record.timestamp * 1000), record.questions, record.staff_count)
+            self.file.close()
+            os.replace(f"{path}.tmp", path)
+        elif records:
+            self.questions = dict(records[-1].questions)
+            self.timestamp_ms = round(records[-1].timestamp * 1000)
+            with open(path, "r+b") as f:
+                f.truncate(valid_length)
+        self.file = open(path, "ab")
+
+    def append(self, timestamp_ms, questions, staff_count):
+        if self.timestamp_ms is None:
+            header = bytearray(HISTORY_MAGIC)
+            encode_varint(timestamp_ms, header)
+            self.file.truncate(0)
+            self.file.write(header)
+            self.timestamp_ms = timestamp_ms
+
+        payload = bytearray()
+        encode_varint(max(0, timestamp_ms - self.timestamp_ms), payload)
+        encode_varint(0 if staff_count is None else staff_count + 1, payload)
+        removed = sorted(
+            question_id for question_id, value in self.questions.items()
+            if questions.get(question_id) != value
+        )
+        encode_varint(len(removed), payload)
+        previous = 0
+        for question_id in removed:
+            encode_varint(question_id - previous, payload)
+            previous = question_id
+        added = sorted(
+            question_id for question_id, value in questions.items()
+            if self.questions.get(question_id) != value
+        )
+        encode_varint(len(added), payload)
+        previous = 0
+        for question_id in added:
+            encode_varint(question_id - previous, payload)
+            previous = question_id
+            netid, topic, enqueued_ms, answer_started_ms = questions[question_id]
+            encode_string(netid, payload)
+            encode_string(topic, payload)
+            encode_optional(enqueued_ms, payload)
+            encode_optional(answer_started_ms, payload)
+
+        frame = bytearray()
+        encode_varint(len(payload), frame)
+        self.file.write(frame + payload)
+        self.file.flush()
+        self.questions = questions
+        self.timestamp_ms = max(self.timestamp_ms, timestamp_ms)
+
+    def close(self):
+        self.file.close()
+
+
+class HistoryStore:
+    """
+    Time-series of queue polls in HISTORY_DIR/queue-<id>/<UTC date>.qh files.
+    Each record stores only the time delta, the staff count and the questions
+    added or removed since the previous record, so an idle queue costs a few
+    bytes per sample. Range scans only open the partitions that overlap.
+    Files are written on one dedicated thread in poll order.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="history")
+        self.writers = {}  # queue_id -> (date, HistoryPartitionWriter); history thread only
+        self.records = 0
+
+    def queue_directory(self, queue_id):
+        return os.path.join(self.directory, "queue-" + re.sub(r"[^\w-]", "_", str(queue_id)))
+
+    def append(self, queue_id, timestamp, questions, staff_count, estimator=None):
+        """
+        Record one poll; questions is the raw API question list, and estimator the
+        queue's WaitTimeEstimator after observing it, for the question times. Never blocks.
+        """
+        rows = {}
+        for question in questions:
+            try:
+                question_id = int(question["id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            enqueued_at, answer_started_at = estimator.question_times(question["id"]) if estimator else (None, None)
+            rows[question_id] = (
+                extract_netid(question) or "",
+                question.get("topic") or "",
+                None if enqueued_at is None else round(enqueued_at * 1000),
+                None if answer_started_at is None else round(answer_started_at * 1000),
+            )
+        future = self.executor.submit(self.write, queue_id, timestamp, rows, staff_count)
+        future.add_done_callback(self.write_done)
+
+    def write(self, queue_id, timestamp, rows, staff_count):
+        date = time_module.strftime("%Y-%m-%d", time_module.gmtime(timestamp))
+        current = self.writers.get(queue_id)
+        if current is None or current[0] != date:
+            if current is not None:
+                current[1].close()
+            directory = self.queue_directory(queue_id)
+            os.makedirs(directory, exist_ok=True)
+            current = self.writers[queue_id] = (date, HistoryPartitionWriter(os.path.join(directory, f"{date}.qh")))
+        current[1].append(round(timestamp * 1000), rows, staff_count)
+        self.records += 1
+
+    def write_done(self, future):
+        if future.exception() is not None:
+            ERRORS_TOTAL.inc("history_write")
+            history_log.error("Error writing queue history: %s", future.exception())
+
+    def partitions(self, queue_id, start, end):
+        """Paths of a queue's day files that may hold timestamps in [start, end), oldest first"""
+        directory = self.queue_directory(queue_id)
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".qh"))
+        except FileNotFoundError:
+            return
+        first_date = time_module.strftime("%Y-%m-%d", time_module.gmtime(start))
+        last_date = time_module.strftime("%Y-%m-%d", time_module.gmtime(end))
+        for name in names:
+            if first_date <= name[:-3] <= last_date:
+                yield os.path.join(directory, name)
+
+    def scan(self, queue_id, start, end):
+        """Yield the HistoryRecords of a queue with start <= timestamp < end, oldest first"""
+        for path in self.partitions(queue_id, start, end):
+            records, _ = read_history_partition(path)
+            for record in records:
+                if start <= record.timestamp < end:
+                    yield record
+
+    def replay(self, queue_id, start, end):
+        """
+        Like scan(), but streams (timestamp, questions) without building a record
+        per poll. questions is the decoder's working dict: read it before advancing.
+        """
+        for path in self.partitions(queue_id, start, end):
+            with open(path, "rb") as f:
+                data = f.read()
+            for timestamp_ms, questions, _, _ in iter_history_frames(data):
+                if start <= timestamp_ms / 1000 < end:
+                    yield timestamp_ms / 1000, questions
+
+    async def run(self, fn, *args):
+        """fn(*args) on the history thread, after any pending writes"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def query(self, queue_id, start, end):
+        """scan() on the history thread, after any pending writes"""
+        return await self.run(lambda: list(self.scan(queue_id, start, end)))
+
+    async def close(self):
+        def close_writers():
+            for _, writer in self.writers.values():
+                writer.close()
+            self.writers.clear()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, close_writers)
+        self.executor.shutdown(wait=False)
+
+
+def build_queue_stats(history):
+    """
+    Rebuild rolling aggregates from (timestamp, questions) history, oldest first.
+    Waits follow WaitTimeEstimator.observe from the recorded question times:
+    enqueue to answer start, or to the poll where a question left unanswered.
+    Questions without times (QBHIST1 files) add no wait samples.
+    Returns (stats, number of polls replayed).
+    """
+    stats = QueueStats()
+    tracked = {}  # question id -> [enqueued_at, answer_started_at]
+    count = 0
+    for timestamp, questions in history:
+        waits = []
+        current = {}
+        for question_id, (_, _, enqueued_ms, answer_started_ms) in questions.items():
+            entry = tracked.get(question_id)
+            if entry is None:
+                entry = [None if enqueued_ms is None else enqueued_ms / 1000, None]
+            if answer_started_ms is not None and entry[1] is None:
+                entry[1] = answer_started_ms / 1000
+                if entry[0] is not None:
+                    waits.append(entry[1] - entry[0])
+            current[question_id] = entry
+        for question_id, (enqueued_at, answer_started_at) in tracked.items():
+            if question_id not in current and answer_started_at is None and enqueued_at is not None:
+                waits.append(timestamp - enqueued_at)
+        tracked = current
+        stats.record(timestamp, questions.keys(), waits)
+        count += 1
+    return stats, count
+
+
+async def warm_up_queue_stats(monitor, end):
+    """
+    Seed a queue's rolling aggregates from the history recorded before end.
+    Runs in the background after the poller has started: the history is
+    streamed on the history thread into separate aggregates, which are then
+    merged into the live ones.
+    """
+    start = end - STATS_RETENTION_DAYS * 86400
+    try:
+        history_stats, count = await history_store.run(
+            lambda: build_queue_stats(history_store.replay(monitor.queue_id, start, end))
+        )
+    except Exception as e:
+        history_log.error("Error reading history for queue %s: %s", monitor.queue_id, e)
+        return
+    monitor.stats.merge(history_stats)
+    if count:
+        history_log.info(
+            "Loaded %d history records for queue %s", count, monitor.queue_id,
+            extra={"queue": monitor.queue_id},
+        )
+
+
+def checkpoint_detector(monitor):
+    if state_store is not None:
+        state_store.checkpoint(monitor.queue_id, monitor.detector.question_netids)
+
+
+def format_groups_message(groups_in_queue, roster):
     """Format a message with information about groups with multiple members in the queue"""
     if not groups_in_queue:
         return "No groups with multiple members found in the queue."
 
-    message = "⚠️ **GROUPS WITH MULTIPLE MEMBERS IN QUEUE** ⚠️\n\n"
+    message = "⚠️ **GROUPS WITH MULTIPLE MEMBERS IN QUEUE** ⚠️\n\n"
+
+    for group_id, members in groups_in_queue.items():
+        message += f"**{group_id}**:\n"
+        message += f"• Members in queue: {', '.join(members)}\n"
+
+        # Show all members of the group for context
+        in_queue = set(members)
+        not_in_queue = [m for m in roster.members(group_id) if m not in in_queue]
+        # bug fix: remove group id from not_in_queue
+        if str(group_id) in not_in_queue:
+            not_in_queue.remove(str(group_id))
+        if not_in_queue:
+            message += f"• Members not in queue: {', '.join(not_in_queue)}\n"
+
+        message += "\n"
+
+    return message
+
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def hour_label(hour):
+    """Format an hour (0-23) the way lab.html labels its rows: 9am, noon, 1pm"""
+    if hour <= 11:
+        return f"{str(hour)}am"
+    elif hour == 12:
+        return "noon"
+    else:
+        return f"{str(hour-12)}pm"
+
+
+class OfficeHoursSchedule:
+    """
+    Weekly office-hours index compiled from lab.html's table.week.
+    cells[day][hour] is the on-duty staff string, or None if that slot has no cell
+    (e.g. lecture blocks); rows[hour] says whether the table has a row for that hour.
+    """
+
+    def __init__(self):
+        self.rows = [False] * 24
+        self.cells = [[None] * 24 for _ in range(7)]
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, OfficeHoursSchedule)
+            and self.rows == other.rows
+            and self.cells == other.cells
+        )
+
+    def has_row(self, hour):
+        return self.rows[hour]
+
+    def lookup(self, day_of_week, hour):
+        return self.cells[day_of_week][hour]
+
+
+def schedule_from_rows(rows):
+    """
+    Build an OfficeHoursSchedule from table rows, each a list of (classes, text)
+    cells in document order. Shared by every parser backend.
+    """
+    hours_by_label = {hour_label(hour): hour for hour in range(24)}
+    schedule = OfficeHoursSchedule()
+
+    # Each td class=rh labels a row; the day-class tds in that row hold the staff
+    for cells in rows:
+        label = next((text for classes, text in cells if "rh" in classes), None)
+        hour = hours_by_label.get(label.strip()) if label is not None else None
+        if hour is None or schedule.rows[hour]:
+            continue
+        schedule.rows[hour] = True
+        for day_of_week, day in enumerate(WEEKDAYS):
+            text = next((text for classes, text in cells if day in classes), None)
+            if text is not None:
+                schedule.cells[day_of_week][hour] = text.replace("\n", "")
+
+    return schedule
+
+
+def parse_schedule_bs4(html):
+    """BeautifulSoup backend: builds the whole DOM with html.parser"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Find the table with class week
+    table = soup.find("table", class_="week")
+    if not table:
+        return None
+
+    rows = []
+    for row in table.find_all("td", class_="rh"):
+        parent = row.find_parent("tr")
+        if parent:
+            rows.append([
+                (td.get("class") or [], td.get_text())
+                for td in parent.find_all("td")
+            ])
+    return schedule_from_rows(rows)
+
+
+def parse_schedule_lxml(html):
+    """lxml backend: C parser plus XPath over table.week only"""
+    def has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    document = lxml.html.fromstring(html)
+    tables = document.xpath(f"//table[{has_class('week')}]")
+    if not tables:
+        return None
+
+    rows = []
+    for row in tables[0].xpath(f".//td[{has_class('rh')}]/ancestor::tr[1]"):
+        rows.append([
+            ((td.get("class") or "").split(), td.text_content())
+            for td in row.xpath(".//td")
+        ])
+    return schedule_from_rows(rows)
+
+
+class WeekTableParser(html.parser.HTMLParser):
+    """
+    Streaming extractor for the first table.week: keeps only the text of that
+    table's cells, closes cells and rows implied by the next <td>/<tr>, and
+    stops reading the page as soon as the table ends.
+    """
+
+    class TableEnd(Exception):
+        pass
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = False
+        self.depth = 0  # Table nesting depth inside table.week (0 = outside)
+        self.rows = []
+        self.row = None
+        self.cell = None  # (classes, text chunks) of the open td
+
+    def end_cell(self):
+        if self.cell is not None:
+            classes, chunks = self.cell
+            if self.row is None:
+                self.row = []
+            self.row.append((classes, "".join(chunks)))
+            self.cell = None
+
+    def end_row(self):
+        self.end_cell()
+        if self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.depth:
+                self.depth += 1
+            elif "week" in (dict(attrs).get("class") or "").split():
+                self.found = True
+                self.depth = 1
+            return
+        if self.depth != 1:
+            return
+        if tag == "tr":
+            self.end_row()
+            self.row = []
+        elif tag in ("td", "th"):
+            self.end_cell()
+            if tag == "td":
+                self.cell = ((dict(attrs).get("class") or "").split(), [])
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag == "table":
+            self.depth -= 1
+            if self.depth == 0:
+                self.end_row()
+                raise self.TableEnd()
+        elif self.depth == 1:
+            if tag == "tr":
+                self.end_row()
+            elif tag == "td":
+                self.end_cell()
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell[1].append(data)
+
+
+def parse_schedule_fast(html):
+    """Streaming backend: tokenizes the page up to the end of table.week, no DOM"""
+    parser = WeekTableParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except WeekTableParser.TableEnd:
+        pass
+    if not parser.found:
+        return None
+    parser.end_row()
+    return schedule_from_rows(parser.rows)
+
+
+SCHEDULE_PARSERS = {
+    "fast": parse_schedule_fast,
+    "lxml": parse_schedule_lxml,
+    "bs4": parse_schedule_bs4,
+}
+
+
+def parse_schedule(html, backend=None):
+    """Parse lab.html into an OfficeHoursSchedule, or None if table.week is missing"""
+    backend = backend or HTML_PARSER
+    if backend == "lxml" and lxml is None:
+        backend = "fast"  # lxml is optional; fall back to the streaming parser
+    if backend not in SCHEDULE_PARSERS:
+        raise ValueError(f"Unknown HTML_PARSER {backend!r}; choose from {', '.join(SCHEDULE_PARSERS)}")
+    return SCHEDULE_PARSERS[backend](html)
+
+
+async def refresh_office_hours_schedule():
+    """
+    Download lab.html and rebuild the schedule index if the page changed.
+    Returns an error message, or None on success.
+    """
+    global office_hours_schedule, office_hours_hash
+
+    started_at = time_module.perf_counter()
+    try:
+        session = get_http_session()
+        async with session.get(OH_URL) as response:
+            if response.status != 200:
+                ERRORS_TOTAL.inc("html_fetch")
+                schedule_log.warning("Error fetching office hours info: %s", response.status)
+                return f"Error fetching office hours info: {response.status}"
+            body = await response.read()
+    except Exception as e:
+        ERRORS_TOTAL.inc("html_fetch")
+        schedule_log.error("Exception fetching office hours info: %s", e)
+        return f"Exception fetching office hours info: {str(e)}"
+    finally:
+        HTML_FETCH_SECONDS.observe(time_module.perf_counter() - started_at)
+
+    page_hash = hashlib.sha256(body).hexdigest()
+    if page_hash == office_hours_hash and office_hours_schedule is not None:
+        return None
+
+    started_at = time_module.perf_counter()
+    try:
+        schedule = await run_in_pool("process", parse_schedule, body.decode("utf-8"))
+    except Exception as e:
+        # Bad encoding, unknown HTML_PARSER or a parser error: report it, never raise
+        ERRORS_TOTAL.inc("html_parse")
+        schedule_log.error("Exception parsing office hours info: %s", e)
+        return f"Exception parsing office hours info: {str(e)}"
+    finally:
+        HTML_PARSE_SECONDS.observe(time_module.perf_counter() - started_at)
+    if schedule is None:
+        ERRORS_TOTAL.inc("html_parse")
+        return "Error parsing the HTML content."
+
+    office_hours_schedule = schedule
+    office_hours_hash = page_hash
+    schedule_log.info("Office hours schedule updated")
+    return None
+
+
+async def get_office_hours_schedule():
+    """Return (schedule, error), fetching the page only if no schedule is loaded yet"""
+    if office_hours_schedule is None:
+        error = await refresh_office_hours_schedule()
+        if office_hours_schedule is None:
+            return None, error or "Error parsing the HTML content."
+    return office_hours_schedule, None
+
+
+async def refresh_schedule_periodically():
+    """Background task that keeps the office-hours schedule index up to date"""
+    await bot.wait_until_ready()
+
+    while not bot.is_closed():
+        try:
+            await refresh_office_hours_schedule()
+        except Exception as e:
+            ERRORS_TOTAL.inc("schedule_refresh")
+            schedule_log.exception("Error in refresh_schedule_periodically: %s", e)
+        await asyncio.sleep(SCHEDULE_REFRESH_INTERVAL)
+
+
+@bot.event
+async def on_ready():
+    """Event handler for when the bot has connected to Discord"""
+    log.info("%s has connected to Discord!", bot.user.name)
+
+    # Load group information
+    global roster
+    roster = await load_roster(GROUPS_CSV_PATH)
+    for monitor in monitors.values():
+        monitor.detector.set_roster(roster)
+    roster_log.info("Loaded %d groups from %s", len(roster), GROUPS_CSV_PATH)
+
+    if not monitors:
+        monitors.update(load_monitored_queues())
+        if not monitors:
+            log.warning(
+                "No queue ID specified. Set the DEFAULT_QUEUE_ID or MONITORED_QUEUES environment variable."
+            )
+
+    # Restore what each detector had seen before a restart, so groups already
+    # in the queue are not alerted again
+    global state_store
+    if STATE_DB_PATH and state_store is None:
+        state_store = DetectorStateStore(STATE_DB_PATH)
+        try:
+            saved_states = await state_store.load()
+        except Exception as e:
+            state_log.error("Error loading detector state from %s: %s", STATE_DB_PATH, e)
+            saved_states = {}
+        for queue_id, monitor in monitors.items():
+            if queue_id in saved_states:
+                monitor.detector.restore(saved_states[queue_id])
+                state_log.info(
+                    "Restored %d questions for queue %s", len(saved_states[queue_id]), queue_id,
+                    extra={"queue": queue_id},
+                )
+
+    global history_store, history_warm_up
+    warm_up_before = None
+    if HISTORY_DIR and history_store is None:
+        history_store = HistoryStore(HISTORY_DIR)
+        warm_up_before = time_module.time()
+
+    # Start (or restart) the background tasks for each monitored queue
+    for monitor in monitors.values():
+        monitor.start()
+
+    # Rebuild !queuestats aggregates from history without delaying the first poll
+    if warm_up_before is not None:
+        history_warm_up = asyncio.gather(
+            *(warm_up_queue_stats(monitor, warm_up_before) for monitor in monitors.values())
+        )
+
+    # Keep the office-hours schedule index fresh in the background
+    global schedule_task
+    if schedule_task is None or schedule_task.done():
+        schedule_task = bot.loop.create_task(refresh_schedule_periodically())
+
+    # Pick up edits to the groups CSV without a !reloadgroups
+    global roster_watch_task
+    if ROSTER_WATCH and (roster_watch_task is None or roster_watch_task.done()):
+        roster_watch_task = bot.loop.create_task(watch_roster_file(GROUPS_CSV_PATH))
+
+    await start_metrics_server()
+
+
+class QueueMonitor:
+    """Polling schedule, alert channel and detector state for one monitored queue"""
+
+    def __init__(self, queue_id, interval=None, channel_id=None):
+        self.queue_id = queue_id
+        self.interval = interval  # None: follow the global CHECK_INTERVAL
+        self.channel_id = channel_id
+        self.detector = GroupCollisionDetector(roster)
+        self.estimator = WaitTimeEstimator()
+        self.stats = QueueStats()
+        self.poll_task = None
+        self.push_task = None
+        self.subscribed = False  # Push channel joined and seeded
+        self.wakeup = asyncio.Event()  # Set to cut the poller's sleep short
+        self.last_length = None  # Questions seen by the latest poll
+        self.idle_polls = 0  # Consecutive polls that found the queue empty
+
+    def record_poll(self, length):
+        self.last_length = length
+        self.idle_polls = 0 if length else self.idle_polls + 1
+
+    def check_interval(self, now=None):
+        """Seconds until the next poll (a live push subscription only needs occasional reconciliation)"""
+        if QUEUE_PUSH and self.subscribed:
+            return RECONCILE_INTERVAL
+        base = self.interval or CHECK_INTERVAL
+        if not ADAPTIVE_POLLING:
+            return base
+        if self.last_length:
+            return min(base, POLL_BUSY_INTERVAL)
+        now = now or datetime.now(CAMPUS_TIMEZONE)
+        if in_scheduled_office_hours(now):
+            return base
+        backoff = min(base * 2 ** min(self.idle_polls, 16), max(base, POLL_MAX_INTERVAL))
+        # Wake by the top of the hour so polling speeds up as soon as office hours start
+        until_next_hour = 3600 - (now.minute * 60 + now.second)
+        return max(base, min(backoff, until_next_hour))
+
+    def next_delay(self):
+        """check_interval() with jitter, so several bots do not poll in lockstep"""
+        return self.check_interval() * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    async def sleep(self):
+        """Wait until the next poll is due, or until woken"""
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), self.next_delay())
+        except asyncio.TimeoutError:
+            pass
+
+    def push_lost(self):
+        """Fall back to normal polling, starting now, when the push channel drops"""
+        if self.subscribed:
+            self.subscribed = False
+            self.wakeup.set()
+
+    def start(self):
+        """Start the poller (and push subscription) unless already running"""
+        if self.poll_task is None or self.poll_task.done():
+            self.poll_task = bot.loop.create_task(check_queue_periodically(self))
+        if QUEUE_PUSH and (self.push_task is None or self.push_task.done()):
+            self.push_task = bot.loop.create_task(subscribe_to_queue(self))
+
+
+def parse_api_time(value):
+    """Epoch seconds for an ISO-8601 timestamp from the queue API, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def ewma(current, sample, alpha=ETA_EWMA_ALPHA):
+    return sample if current is None else current + alpha * (sample - current)
+
+
+class WaitTimeEstimator:
+    """
+    Online wait-time model for one queue, fed by successive views of its questions.
+    Keeps an EWMA of seconds per question for each staff member who has been seen
+    answering (O(1) memory per staff), plus a pooled estimate from the departure
+    rate for staff without samples of their own.
+    """
+
+    def __init__(self):
+        self.tracked = {}  # question id -> [enqueued_at, netid, answer_started_at, answered_by]
+        self.waiting = []  # (enqueued_at, question id, netid) of unanswered questions, oldest first
+        self.staff_service = {}  # staff netid -> [EWMA seconds per question, samples]
+        self.pooled_service = None
+        self.active_staff = []  # netids of the staff currently on duty
+        self.busy_staff_seconds = 0.0  # Staff-seconds spent with a non-empty queue since the last departure
+        self.updated_at = None
+
+    def observe(self, questions, active_staff=None, now=None):
+        """
+        Update from the queue's current questions (and activeStaff, if fetched).
+        Returns the waits, in seconds, of the questions whose wait ended since the last call.
+        """
+        now = now or time_module.time()
+        if active_staff is not None:
+            self.active_staff = [
+                (staff.get("user") or {}).get("netid") or (staff.get("user") or {}).get("name", "")
+                for staff in active_staff
+            ]
+        if self.updated_at is not None and self.waiting and self.active_staff:
+            self.busy_staff_seconds += (now - self.updated_at) * len(self.active_staff)
+
+        waits = []
+        current = {}
+        for question in questions:
+            question_id = question.get("id")
+            if question_id is None:
+                continue
+            entry = self.tracked.get(question_id)
+            if entry is None:
+                enqueued_at = parse_api_time(question.get("enqueueTime")) or now
+                entry = [enqueued_at, extract_netid(question), None, None]
+            if question.get("beingAnswered") and entry[2] is None:
+                entry[2] = parse_api_time(question.get("answerStartTime")) or now
+                entry[3] = (question.get("answeredBy") or {}).get("netid")
+                waits.append(entry[2] - entry[0])
+            current[question_id] = entry
+
+        departures = 0
+        for question_id, (enqueued_at, _, answer_started_at, answered_by) in self.tracked.items():
+            if question_id in current:
+                continue
+            departures += 1
+            if answer_started_at is None:
+                # Answered (or withdrawn) entirely between two observations
+                waits.append(now - enqueued_at)
+            elif answered_by:
+                stats = self.staff_service.setdefault(answered_by, [None, 0])
+                stats[0] = ewma(stats[0], now - answer_started_at)
+                stats[1] += 1
+        if departures and self.busy_staff_seconds > 0:
+            self.pooled_service = ewma(self.pooled_service, self.busy_staff_seconds / departures)
+            self.busy_staff_seconds = 0.0
+
+        self.tracked = current
+        self.waiting = sorted(
+            (entry[0], question_id, entry[1])
+            for question_id, entry in current.items()
+            if entry[2] is None
+        )
+        self.updated_at = now
+        return waits
+
+    def question_times(self, question_id):
+        """(enqueued_at, answer_started_at) of a tracked question; None where unknown"""
+        entry = self.tracked.get(question_id)
+        if entry is None:
+            return None, None
+        return entry[0], entry[2]
+
+    def service_time(self, staff_netid):
+        stats = self.staff_service.get(staff_netid)
+        if stats and stats[0] is not None:
+            return max(stats[0], 1.0)
+        return max(self.pooled_service or ETA_DEFAULT_SERVICE, 1.0)
+
+    def estimate(self, position):
+        """Seconds until the question at this 0-based waiting position is picked up, or None without staff"""
+        rate = sum(1 / self.service_time(netid) for netid in self.active_staff)
+        if rate <= 0:
+            return None
+        return (position + 1) / rate
+
+    def position_of(self, netid):
+        for position, (_, _, waiting_netid) in enumerate(self.waiting):
+            if waiting_netid == netid:
+                return position
+        return None
+
+    def is_being_answered(self, netid):
+        return any(entry[1] == netid and entry[2] is not None for entry in self.tracked.values())
 
-    for group_id, members in groups_in_queue.items():
-        message += f"**{group_id}**:\n"
-        message += f"• Members in queue: {', '.join(members)}\n"
 
-        # Show all members of the group for context
-        all_members = group_to_members.get(group_id, [])
-        not_in_queue = [m for m in all_members if m not in members]
-        # bug fix: remove group id from not_in_queue
-        if str(group_id) in not_in_queue:
-            not_in_queue.remove(str(group_id))
-        if not_in_queue:
-            message += f"• Members not in queue: {', '.join(not_in_queue)}\n"
+class QuantileSketch:
+    """
+    Log-bucketed histogram of positive values: any quantile within ~5% relative
+    error, in memory proportional to the value range rather than the sample count.
+    Sketches merge by adding bucket counts.
+    """
 
-        message += "\n"
+    GAMMA = 1.1
+    LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.total = 0
+
+    def add(self, value):
+        index = math.ceil(math.log(max(value, 1.0)) / self.LOG_GAMMA)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+
+    def quantile(self, q):
+        if not self.total:
+            return None
+        rank = q * (self.total - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                # Midpoint of the bucket (GAMMA^(index-1), GAMMA^index]
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+        return self.GAMMA ** max(self.counts)
+
+
+class HourBucket:
+    """Aggregates for one clock hour of one queue"""
+
+    def __init__(self):
+        self.arrivals = 0
+        self.departures = 0
+        self.peak_length = 0
+        self.length_seconds = 0.0  # Integral of queue length over time
+        self.seconds = 0.0
+        self.waits = QuantileSketch()
+
+    def merge(self, other):
+        self.arrivals += other.arrivals
+        self.departures += other.departures
+        self.peak_length = max(self.peak_length, other.peak_length)
+        self.length_seconds += other.length_seconds
+        self.seconds += other.seconds
+        self.waits.merge(other.waits)
+
+
+class QueueStats:
+    """
+    Rolling hourly aggregates for !queuestats, updated on every poll tick:
+    arrivals, departures, peak and time-weighted length, and a wait-time sketch.
+    Reporting merges at most one bucket per hour of the window and never reads
+    the raw history. Buckets older than STATS_RETENTION_DAYS are dropped.
+    """
 
-    return message
+    def __init__(self):
+        self.buckets = {}  # epoch hour -> HourBucket
+        self.question_ids = set()
+        self.updated_at = None
+        self.length = 0
+
+    def record(self, now, question_ids, waits=()):
+        question_ids = set(question_ids)
+        bucket = self.buckets.get(int(now // 3600))
+        if bucket is None:
+            bucket = self.buckets[int(now // 3600)] = HourBucket()
+            oldest = int(now // 3600) - STATS_RETENTION_DAYS * 24
+            for hour in [hour for hour in self.buckets if hour < oldest]:
+                del self.buckets[hour]
+
+        if self.updated_at is not None:
+            elapsed = max(0.0, now - self.updated_at)
+            bucket.length_seconds += self.length * elapsed
+            bucket.seconds += elapsed
+            bucket.arrivals += len(question_ids - self.question_ids)
+            bucket.departures += len(self.question_ids - question_ids)
+        bucket.peak_length = max(bucket.peak_length, len(question_ids))
+        for wait in waits:
+            bucket.waits.add(wait)
+
+        self.question_ids = question_ids
+        self.length = len(question_ids)
+        self.updated_at = now
+
+    def merge(self, other):
+        """Add another QueueStats' hourly buckets (e.g. rebuilt from history) into these"""
+        for hour, bucket in other.buckets.items():
+            if hour in self.buckets:
+                self.buckets[hour].merge(bucket)
+            else:
+                self.buckets[hour] = bucket
+
+    def summary(self, window, now=None):
+        """Merge the buckets of the last window seconds into one report dictionary"""
+        now = now or time_module.time()
+        first_hour = int((now - window) // 3600)
+        waits = QuantileSketch()
+        arrivals = departures = 0
+        peak_length, peak_hour = 0, None
+        by_hour_of_day = {}  # hour of day -> [length_seconds, seconds]
+        for hour, bucket in self.buckets.items():
+            if hour < first_hour:
+                continue
+            arrivals += bucket.arrivals
+            departures += bucket.departures
+            waits.merge(bucket.waits)
+            if bucket.peak_length > peak_length:
+                peak_length, peak_hour = bucket.peak_length, hour
+            hour_of_day = datetime.fromtimestamp(hour * 3600, CAMPUS_TIMEZONE).hour
+            totals = by_hour_of_day.setdefault(hour_of_day, [0.0, 0.0])
+            totals[0] += bucket.length_seconds
+            totals[1] += bucket.seconds
+
+        average_length = {
+            hour: length_seconds / seconds
+            for hour, (length_seconds, seconds) in by_hour_of_day.items()
+            if seconds > 0
+        }
+        return {
+            "arrivals": arrivals,
+            "departures": departures,
+            "wait_count": waits.total,
+            "wait_median": waits.quantile(0.5),
+            "wait_p90": waits.quantile(0.9),
+            "peak_length": peak_length,
+            "peak_time": peak_hour * 3600 if peak_hour is not None else None,
+            "busiest_hours": sorted(average_length.items(), key=lambda item: -item[1])[:3],
+        }
+
+
+def in_scheduled_office_hours(now):
+    """
+    True within the staffed window when lab.html lists staff for the current hour.
+    Until the schedule is loaded, the whole window counts as office hours.
+    """
+    if not (WORKING_HOURS_START <= now.time() <= WORKING_HOURS_END):
+        return False
+    schedule = office_hours_schedule
+    if schedule is None or not schedule.has_row(now.hour):
+        return schedule is None
+    staff = schedule.lookup(now.weekday(), now.hour)
+    return bool(staff and staff.strip())
 
 
-@bot.event
-async def on_ready():
-    """Event handler for when the bot has connected to Discord"""
-    print(f"{bot.user.name} has connected to Discord!")
+def load_monitored_queues():
+    """
+    Build the monitored queues from MONITORED_QUEUES, a comma-separated list of
+    queue_id[:interval[:alert_channel_id]] entries. Falls back to DEFAULT_QUEUE_ID
+    with CHECK_INTERVAL and ALERT_CHANNEL_ID.
+    """
+    default_channel = int(os.getenv("ALERT_CHANNEL_ID", "0"))
+    result = {}
 
-    # Load group information
-    global netid_to_group, group_to_members
-    netid_to_group, group_to_members = load_groups_from_csv(GROUPS_CSV_PATH)
-    print(f"Loaded {len(group_to_members)} groups from {GROUPS_CSV_PATH}")
+    for entry in os.getenv("MONITORED_QUEUES", "").split(","):
+        parts = [part.strip() for part in entry.split(":")]
+        if not parts[0]:
+            continue
+        interval = int(parts[1]) if len(parts) > 1 and parts[1] else None
+        channel_id = int(parts[2]) if len(parts) > 2 and parts[2] else default_channel
+        result[parts[0]] = QueueMonitor(parts[0], interval, channel_id)
 
-    # Start the background task for queue checking
-    bot.loop.create_task(check_queue_periodically())
+    default_queue = os.getenv("DEFAULT_QUEUE_ID", "")
+    if not result and default_queue:
+        result[default_queue] = QueueMonitor(default_queue, None, default_channel)
+    return result
 
 
-async def check_queue_periodically():
-    """Background task to periodically check the queue for group members"""
+async def check_queue_periodically(monitor):
+    """Background task to periodically check one queue for group members"""
     await bot.wait_until_ready()
 
     while not bot.is_closed():
         try:
             # Only proceed if we're connected and there are groups loaded
-            if group_to_members:
-                await check_queue_for_groups()
+            if roster:
+                await check_queue_for_groups(monitor)
 
             # Wait for the next check
-            await asyncio.sleep(CHECK_INTERVAL)
+            await monitor.sleep()
 
         except Exception as e:
-            print(f"Error in check_queue_periodically: {str(e)}")
+            ERRORS_TOTAL.inc("poll")
+            monitor_log.exception(
+                "Error in check_queue_periodically for queue %s: %s", monitor.queue_id, e,
+                extra={"queue": monitor.queue_id},
+            )
             await asyncio.sleep(60)  # Wait a minute before retrying on error
 
 
-async def check_queue_for_groups():
-    """Check the queue for group members and send alerts if found"""
-    global previous_groups_in_queue
-
-    # Use the first command line argument as the queue ID if provided
-    queue_id = os.getenv("DEFAULT_QUEUE_ID", "")
-    if not queue_id:
-        print(
-            "No queue ID specified. Set the DEFAULT_QUEUE_ID environment variable."
-        )
-        return
-
-    # Get questions for the specified queue
-    questions = await get_questions_for_queue(
-        DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN
-    )
-
-    if not questions:
-        print(
-            f"No questions found for queue {queue_id} or error fetching questions."
+async def check_queue_for_groups(monitor):
+    """Check one queue for group members and send alerts if found"""
+    queue_id = monitor.queue_id
+
+    # Take a fresh snapshot; commands issued meanwhile reuse it.
+    # The semaphore bounds how many queues hit the API at the same time.
+    async with fetch_semaphore:
+        snapshot = await get_queue_snapshot(queue_id, max_age=0)
+    result = snapshot.questions_result
+    if not result.fresh:
+        # Keep the detector as it was: treating an outage as an empty queue
+        # would re-alert every group once the API recovers
+        monitor_log.warning(
+            "Skipping group check for queue %s: %s", queue_id, result.error,
+            extra={"queue": queue_id},
         )
         return
 
-    # Extract NetIDs from questions
-    netids = []
-    for question in questions:
-        netid = extract_netid(question)
-        if netid:
-            netids.append(netid)
-
-    # Check if multiple members of the same group are in the queue
-    groups_in_queue = check_group_members_in_queue(
-        netids, netid_to_group, group_to_members
-    )
+    questions = result.data
+    monitor.record_poll(len(questions))
+    active_staff = snapshot.active_staff if snapshot.info_result.fresh else None
+    waits = monitor.estimator.observe(questions, active_staff)
+    monitor.stats.record(time_module.time(), (q["id"] for q in questions if "id" in q), waits)
+    if history_store is not None:
+        staff_count = len(active_staff) if active_staff is not None else None
+        history_store.append(queue_id, time_module.time(), questions, staff_count, monitor.estimator)
 
-    # Determine which groups are new compared to the previous check
-    new_groups = {}
-    for group_id, members in groups_in_queue.items():
-        if group_id not in previous_groups_in_queue:
-            # This group wasn't in the queue before
-            new_groups[group_id] = members
-        else:
-            # This group was in the queue before, but check if there are new members
-            prev_members = set(previous_groups_in_queue[group_id])
-            current_members = set(members)
-            if not prev_members.issuperset(current_members):
-                # There are new members in this group
-                new_groups[group_id] = members
+    if QUEUE_PUSH:
+        # Reconcile the push-maintained question set with the full list
+        live_questions[queue_id] = {q["id"]: q for q in questions}
 
+    if not questions:
+        monitor_log.info("No questions found for queue %s.", queue_id, extra={"queue": queue_id})
+
+    await process_queue_questions(monitor, questions)
+
+
+async def process_queue_questions(monitor, questions):
+    """Sync the queue's detector with a full question list and alert on new groups"""
+    started_at = time_module.perf_counter()
+    new_groups = monitor.detector.sync(questions)
+    GROUP_CHECK_SECONDS.observe(time_module.perf_counter() - started_at, "sync")
+    checkpoint_detector(monitor)
+    await send_group_alert(monitor, new_groups)
+
+
+async def process_queue_delta(monitor, old_question, new_question):
+    """Feed a single question add/remove/update into the detector and alert if needed"""
+    questions = live_questions.get(monitor.queue_id, {})
+    waits = monitor.estimator.observe(questions.values())
+    monitor.stats.record(time_module.time(), questions.keys(), waits)
+    old_netid = extract_netid(old_question) if old_question else None
+    new_netid = extract_netid(new_question) if new_question else None
+    if old_netid == new_netid and old_question and new_question:
+        return  # Topic/status update from the same student: nothing to re-check
+
+    started_at = time_module.perf_counter()
+    collision = None
+    if old_question:
+        monitor.detector.question_removed(old_question["id"])
+    if new_question and new_netid:
+        collision = monitor.detector.question_added(new_question["id"], new_netid)
+    GROUP_CHECK_SECONDS.observe(time_module.perf_counter() - started_at, "delta")
+    checkpoint_detector(monitor)
+    if collision:
+        await send_group_alert(monitor, dict([collision]))
+
+
+async def send_group_alert(monitor, new_groups):
+    """Send an alert about newly detected groups to the queue's alert channel"""
     # If there are new groups with multiple members in the queue, send an alert
     if new_groups:
-        alert_channel_id = int(os.getenv("ALERT_CHANNEL_ID", "0"))
+        alert_channel_id = monitor.channel_id
         if alert_channel_id > 0:
             channel = bot.get_channel(alert_channel_id)
             if channel:
-                message = format_groups_message(new_groups, group_to_members)
-                await channel.send(message)
+                title = f"**Queue {monitor.queue_id}**" if len(monitors) > 1 else None
+                response = ResponseBuilder(title)
+                response.add(format_groups_message(new_groups, roster))
+                response.send(channel, embed=False, priority=PRIORITY_ALERT)
+                ALERTS_SENT_TOTAL.inc(monitor.queue_id)
             else:
-                print(f"Could not find channel with ID {alert_channel_id}")
+                ERRORS_TOTAL.inc("alert_channel")
+                send_log.warning("Could not find channel with ID %s", alert_channel_id, extra={"queue": monitor.queue_id})
+
+
+async def subscribe_to_queue(monitor):
+    """
+    Background task that follows a queue's push channel, reconnecting with backoff.
+    Polling slows to RECONCILE_INTERVAL only while subscribed, and resumes its
+    normal interval whenever the channel is down.
+    """
+    await bot.wait_until_ready()
+    backoff = 1
+
+    while not bot.is_closed():
+        try:
+            await run_push_session(monitor)
+            backoff = 1
+        except Exception as e:
+            ERRORS_TOTAL.inc("push")
+            monitor_log.warning("Error in push subscription for queue %s: %s", monitor.queue_id, e, extra={"queue": monitor.queue_id})
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def run_push_session(monitor):
+    """
+    Hold one Socket.IO (Engine.IO v4, websocket transport) connection to the queue.
+    Seeds the question set over REST once joined, then applies add/update/delete events.
+    """
+    queue_id = monitor.queue_id
+    headers = {}
+    if QUEUE_TOKEN:
+        headers["Private-Token"] = QUEUE_TOKEN
+    namespace = QUEUE_SOCKET_NAMESPACE
+    event_prefix = f"42{namespace},"
+
+    session = get_http_session()
+    url = f"{QUEUE_SOCKET_URL}?EIO=4&transport=websocket"
+    try:
+        async with session.ws_connect(url, headers=headers, autoping=True) as ws:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                packet = msg.data
+
+                if packet.startswith("0"):
+                    # Engine.IO open: connect to the queue namespace
+                    await ws.send_str(f"40{namespace},")
+                elif packet == "2":
+                    # Engine.IO ping from the server
+                    await ws.send_str("3")
+                elif packet.startswith(f"40{namespace}"):
+                    # Namespace connected: join the queue room, then seed from REST
+                    join = json.dumps(["join", {"queueId": queue_id}])
+                    await ws.send_str(f"{event_prefix}{join}")
+                    result = await get_questions_for_queue(
+                        DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN, max_age=0
+                    )
+                    if not result.fresh:
+                        # Reconnect (with backoff) rather than seed from missing or stale data
+                        raise ConnectionError(f"could not seed queue {queue_id}: {result.error}")
+                    questions = result.data
+                    live_questions[queue_id] = {q["id"]: q for q in questions}
+                    monitor.subscribed = True
+                    monitor_log.info("Subscribed to push updates for queue %s", queue_id, extra={"queue": queue_id})
+                    await process_queue_questions(monitor, questions)
+                elif packet.startswith(event_prefix):
+                    event, *args = json.loads(packet[len(event_prefix):])
+                    change = apply_queue_event(queue_id, event, args[0] if args else None)
+                    if change:
+                        await process_queue_delta(monitor, *change)
+                elif packet.startswith(f"41{namespace}") or packet.startswith("1"):
+                    # Namespace disconnect or Engine.IO close
+                    return
+    finally:
+        # Also runs on errors and cancellation
+        monitor.push_lost()
+
+
+def apply_queue_event(queue_id, event, payload):
+    """
+    Apply one push event to the live question set.
+    Returns (old_question, new_question) if it changed anything, otherwise None.
+    """
+    questions = live_questions.setdefault(queue_id, {})
+    if not isinstance(payload, dict):
+        return None
+    question = payload.get("question", payload)
+
+    if event in ("question:create", "question:update"):
+        if "id" not in question:
+            return None
+        old_question = questions.get(question["id"])
+        questions[question["id"]] = question
+        return old_question, question
+    if event == "question:delete":
+        question_id = question.get("id", payload.get("questionId"))
+        old_question = questions.pop(question_id, None)
+        if old_question is None:
+            return None
+        return old_question, None
+    return None
 
-    # Update the previous groups in queue for the next check
-    previous_groups_in_queue = groups_in_queue
 
 def check_message_format(netids, topics):
     #regex = "^\[(MP|Conceptual)\] ,Group \d+, Computer \d+ : .+$"
@@ -294,346 +2810,432 @@ def check_message_format(netids, topics):
     return message
 
 
-@bot.command(name='checkqueue')
-async def check_queue_command(ctx, queue_id=None):
+class OutboundMessage:
+    """One queued Discord message and the future resolved once it is sent (or fails)"""
+
+    def __init__(self, content=None, embeds=None, priority=PRIORITY_REPLY):
+        self.content = content
+        self.embeds = embeds
+        self.priority = "alert" if priority == PRIORITY_ALERT else "reply"
+        self.queued_at = time_module.monotonic()
+        self.delivered = asyncio.get_running_loop().create_future()
+
+
+class ChannelSender:
     """
-    Command to check for groups in the queue
-    Usage: !checkqueue [queue_id]
+    Outbound queue for one Discord channel, drained by a single worker task.
+    Alerts are sent before replies, and consecutive plain-text messages of the
+    same priority are merged while they fit in one message. Rate-limit sleeps
+    happen in the worker instead of in command handlers.
     """
-    if not queue_id:
-        queue_id = os.getenv("DEFAULT_QUEUE_ID", "")
-        if not queue_id:
-            await ctx.send(
-                "No queue ID specified. Please provide a queue ID or set the DEFAULT_QUEUE_ID environment variable."
-            )
-            return
-    
 
-    await ctx.send(f"Checking queue {queue_id} for group members...")
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = {PRIORITY_ALERT: collections.deque(), PRIORITY_REPLY: collections.deque()}
+        self.wakeup = asyncio.Event()
+        self.worker = None
+        self.sent = 0
+        self.merged = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def depth(self):
+        return sum(len(queue) for queue in self.pending.values())
+
+    def submit(self, message, priority):
+        self.pending[priority].append(message)
+        self.wakeup.set()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.ensure_future(self.run())
+        return message.delivered
+
+    def next_batch(self):
+        """Pop the highest-priority message, merged with any text messages behind it"""
+        for priority in (PRIORITY_ALERT, PRIORITY_REPLY):
+            queue = self.pending[priority]
+            if not queue:
+                continue
+            batch = [queue.popleft()]
+            if batch[0].embeds:
+                return batch
+            length = len(batch[0].content)
+            while queue and not queue[0].embeds:
+                next_length = length + 1 + len(queue[0].content)
+                if next_length > DISCORD_MESSAGE_LIMIT:
+                    break
+                batch.append(queue.popleft())
+                length = next_length
+            return batch
+        return []
 
-    # Get questions for the specified queue
-    questions = await get_questions_for_queue(
-        DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN
-    )
+    async def run(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            first = batch[0]
+            sends = 1
+            try:
+                if first.embeds:
+                    await self.channel.send(embeds=first.embeds)
+                else:
+                    text = "\n".join(message.content for message in batch)
+                    # Merging never exceeds the limit, but a single message queued
+                    # as-is can: split it rather than have Discord reject it
+                    pages = paginate(text) if len(text) > DISCORD_MESSAGE_LIMIT else [text]
+                    for page in pages:
+                        await self.channel.send(page)
+                    sends = len(pages)
+            except Exception as e:
+                # Failed sends stay out of the sent counts and latency figures
+                self.errors += 1
+                ERRORS_TOTAL.inc("discord_send")
+                send_log.error("Error sending message to channel %s: %s", getattr(self.channel, "id", "?"), e)
+                for message in batch:
+                    if not message.delivered.done():
+                        message.delivered.set_result(False)
+                continue
+
+            now = time_module.monotonic()
+            self.sent += sends
+            self.merged += len(batch) - 1
+            for message in batch:
+                latency = now - message.queued_at
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                DISCORD_SEND_SECONDS.observe(latency, message.priority)
+                if not message.delivered.done():
+                    message.delivered.set_result(True)
+
+
+def send_reply(destination, content=None, embeds=None, priority=PRIORITY_REPLY):
+    """
+    Queue a message for a channel or command context without waiting for Discord.
+    Returns a future that resolves to True once the message has been sent, or
+    to False if Discord rejected it. A flag rather than an exception, since most
+    callers never await the future.
+    """
+    channel = getattr(destination, "channel", destination)
+    key = getattr(channel, "id", None) or id(channel)
+    sender = channel_senders.get(key)
+    if sender is None:
+        sender = channel_senders[key] = ChannelSender(channel)
+    return sender.submit(OutboundMessage(content, embeds, priority), priority)
+
+
+def paginate(text, limit=DISCORD_MESSAGE_LIMIT):
+    """Split text into chunks of at most limit characters, preferring line breaks"""
+    pages = []
+    current = ""
+    for line in text.split("\n"):
+        # Hard-split any single line that cannot fit on a page by itself
+        while len(line) > limit:
+            if current:
+                pages.append(current)
+                current = ""
+            pages.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            pages.append(current)
+            current = line
+        else:
+            current = candidate
+    if current.strip():
+        pages.append(current)
+    return pages
 
-    if not questions:
-        await ctx.send(
-            f"No questions found for queue {queue_id} or error fetching questions."
-        )
-        return
-    
-    # Extract NetIDs and text from questions
-    netids = []
-    topics = []
-    for question in questions:
-        netid = extract_netid(question)
-        if netid:
-            netids.append(netid)
-            if question["topic"]: # Put this under here to avoid length mismatch
-                topics.append(question["topic"])
-    
-    await ctx.send(f"Found {len(netids)} questions with NetIDs in the queue.")
 
-    # Check if multiple members of the same group are in the queue
-    groups_in_queue = check_group_members_in_queue(
-        netids, netid_to_group, group_to_members
-    )
+class ResponseBuilder:
+    """
+    Collects the sections of a reply and sends them in as few Discord messages
+    as possible, paginating at the message and embed size limits.
+    """
 
-    # Format and send the message
-    message = format_groups_message(groups_in_queue, group_to_members)
+    def __init__(self, title=None):
+        self.title = title
+        self.sections = []
+
+    def add(self, *lines):
+        """Add a section; each argument becomes its own line"""
+        self.sections.append("\n".join(line for line in lines if line is not None))
+        return self
+
+    def text(self):
+        body = "\n".join(self.sections)
+        return f"{self.title}\n{body}" if self.title else body
+
+    def messages(self):
+        """Plain-text pages that each fit in one Discord message"""
+        return paginate(self.text(), DISCORD_MESSAGE_LIMIT)
+
+    def embeds(self):
+        """Embeds, each holding one page of the body"""
+        pages = paginate("\n".join(self.sections), DISCORD_EMBED_DESCRIPTION_LIMIT)
+        embeds = []
+        for page_number, page in enumerate(pages, 1):
+            title = self.title
+            if title and len(pages) > 1:
+                title = f"{title} ({page_number}/{len(pages)})"
+            embeds.append(discord.Embed(title=title, description=page))
+        return embeds
+
+    def send(self, destination, embed=None, priority=PRIORITY_REPLY):
+        """Queue everything collected so far for a channel or command context"""
+        if embed is None:
+            embed = RESPONSE_EMBEDS
+        if not embed:
+            for page in self.messages():
+                send_reply(destination, page, priority=priority)
+            return
 
-    await ctx.send(message)
+        # Pack as many embeds per message as Discord allows (10, 6000 characters)
+        batch = []
+        batch_size = 0
+        for item in self.embeds():
+            size = len(item.title or "") + len(item.description or "")
+            if batch and (len(batch) == 10 or batch_size + size > DISCORD_EMBED_TOTAL_LIMIT):
+                send_reply(destination, embeds=batch, priority=priority)
+                batch = []
+                batch_size = 0
+            batch.append(item)
+            batch_size += size
+        if batch:
+            send_reply(destination, embeds=batch, priority=priority)
+
+
+class QueueSnapshot:
+    """
+    Questions and queue info for one queue, fetched together.
+    Derived views are computed at most once per snapshot and shared by every reader.
+    """
 
-    # Check for questions with wrong format
+    def __init__(self, queue_id, questions_result, info_result):
+        self.queue_id = queue_id
+        self.questions_result = questions_result
+        self.info_result = info_result
+        self.questions = questions_result.data or []
+        self.queue_info = info_result.data or {}
+        self.taken_at = time_module.monotonic()
 
-    await ctx.send("Checking for questions with wrong format...")
-    message = check_message_format(netids, topics)
-    await ctx.send(message)
+    def age(self):
+        return time_module.monotonic() - self.taken_at
 
-@bot.command(name="checkstaff")
-async def check_staff_command(ctx, queue_id=None):
+    @functools.cached_property
+    def netids_and_topics(self):
+        """NetIDs of the questions, plus the topics of those that have one"""
+        netids = []
+        topics = []
+        for question in self.questions:
+            netid = extract_netid(question)
+            if netid:
+                netids.append(netid)
+                if question["topic"]: # Put this under here to avoid length mismatch
+                    topics.append(question["topic"])
+        return netids, topics
+
+    @functools.cached_property
+    def groups_in_queue(self):
+        netids, _ = self.netids_and_topics
+        return check_group_members_in_queue(netids, roster)
+
+    @functools.cached_property
+    def groups_message(self):
+        return format_groups_message(self.groups_in_queue, roster)
+
+    @functools.cached_property
+    def format_message(self):
+        return check_message_format(*self.netids_and_topics)
+
+    @functools.cached_property
+    def active_staff(self):
+        """The queue info's activeStaff list, or None if the info is missing or malformed"""
+        if not isinstance(self.queue_info, dict):
+            return None  # An EMPTY result is [], not an object
+        active_staff = self.queue_info.get("activeStaff")
+        return active_staff if isinstance(active_staff, list) else None
+
+    @functools.cached_property
+    def staff_str(self):
+        """Human-readable list of the active staff"""
+        active_staff = self.active_staff
+        if active_staff == []:
+            return f"No active staff found for queue {self.queue_id}."
+        names = ", ".join(staff["user"]["name"] for staff in active_staff)
+        if len(active_staff) > 1:
+            return f"{names} are on duty."
+        return f"{names} is on duty."
+
+
+async def build_queue_snapshot(queue_id, max_age):
     """
-    Command to check for staff in the queue
-    Usage: !checkstaff [queue_id]
+    Fetch questions and queue info concurrently. The office-hours schedule is not
+    part of the snapshot, so the poller never waits on lab.html.
     """
-    if not queue_id:
-        queue_id = os.getenv("DEFAULT_QUEUE_ID", "")
-        if not queue_id:
-            await ctx.send("No queue ID specified. Please provide a queue ID or set the DEFAULT_QUEUE_ID environment variable.")
-            return
-    
-    queue_info = await get_queue_info(DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN)
-    if not queue_info:
-        await ctx.send(f"Error fetching queue info for queue {queue_id}.")
-        return
-    
-    staff_str = ""
-    #Extract activeStaff from queue_info
-    if queue_info["activeStaff"] == []:
-        staff_str = f"No active staff found for queue {queue_id}."
-    else :
-        for staff in queue_info["activeStaff"]:
-            staff_name = staff["user"]["name"]
-            staff_str += f"{staff_name}, "
-        staff_str = staff_str[:-2]  # Remove the trailing comma and space
-        if len(queue_info["activeStaff"]) > 1:
-            staff_str = f"{staff_str} are on duty."
-        else:
-            staff_str = f"{staff_str} is on duty."
+    questions_result, info_result = await asyncio.gather(
+        get_questions_for_queue(DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN, max_age),
+        get_queue_info(DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN, max_age),
+    )
+    snapshot = QueueSnapshot(queue_id, questions_result, info_result)
+    queue_snapshots[queue_id] = snapshot
+    return snapshot
 
-    curtime = datetime.now(ZoneInfo("America/Chicago")).time()
 
-    start_time = time(8, 0)  # 8:00 AM
-    end_time = time(22, 0)  # 10:00 PM
-    if not (start_time <= curtime <= end_time):
-        await ctx.send("Current time is outside of working hours.")
-        if queue_info["activeStaff"] != []:
-            await ctx.send("But there are still active staff members.")
-            await ctx.send(staff_str)
-            return
-        else:
-            await ctx.send("And there are no active staff members.")
-            return
-    else:
-        try:
-            response = await asyncio.to_thread(requests.get, OH_URL)
-            if response.status_code != 200:
-                print(f"Error fetching queue info for queue {queue_id}: {response.status_code}")
-                await ctx.send(f"Error fetching queue info for queue {queue_id}: {response.status_code}")
-                return
-        except Exception as e:
-            print(f"Exception in get_queue_info: {str(e)}")
-            await ctx.send(f"Exception in get_queue_info: {str(e)}")
-            return
-        
-        # Parse the HTML content
-        html = response.content.decode("utf-8")
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Find the table with class week
-        table = soup.find("table", class_="week")
-        if not table:
-            await ctx.send("Error parsing the HTML content.")
-            return
-        
-        #Find the row within the table
-        hour = datetime.now(ZoneInfo("America/Chicago")).hour
-        hour_str = ""
-        if hour <= 11:
-            hour_str = f"{str(hour)}am"
-        elif hour == 12:
-            hour_str = "noon"
-        else:
-            hour_str = f"{str(hour-12)}pm"
+async def get_queue_snapshot(queue_id, max_age=SNAPSHOT_MAX_AGE):
+    """
+    Return a snapshot of the queue no older than max_age seconds.
+    Concurrent callers share one snapshot build.
+    """
+    snapshot = queue_snapshots.get(queue_id)
+    if snapshot and max_age > 0 and snapshot.age() <= max_age:
+        return snapshot
+
+    task = inflight_snapshots.get(queue_id)
+    if task is None:
+        task = asyncio.ensure_future(build_queue_snapshot(queue_id, max_age))
+        inflight_snapshots[queue_id] = task
+        task.add_done_callback(lambda _: inflight_snapshots.pop(queue_id, None))
+    return await asyncio.shield(task)
+
+
+def queue_status_lines(snapshot):
+    """Describe groups and question format for a snapshot, one section per line"""
+    result = snapshot.questions_result
+    if result.kind == FetchResult.ERROR:
+        return [f"Error fetching questions for queue {snapshot.queue_id}."]
+    if not snapshot.questions:
+        return [f"No questions found for queue {snapshot.queue_id}."]
+
+    netids, _ = snapshot.netids_and_topics
+    stale = []
+    if result.kind == FetchResult.STALE:
+        stale = [f"⚠️ Queue API unavailable; showing data from {result.age:.0f}s ago."]
+    return stale + [
+        f"Found {len(netids)} questions with NetIDs in the queue.",
+        snapshot.groups_message,
+        snapshot.format_message,
+    ]
 
-        #Now find the td class=rh with the hour_str
-        row = table.find("td", class_="rh", string=hour_str)
-        if not row:
-            await ctx.send("Error parsing the HTML content.")
-            return
-    
-        parent = row.find_parent("tr")
-        if not parent:
-            print("Error parsing the HTML content.")
-            return
 
-        #get day of the week in number
-        day_of_week = datetime.now().weekday()
-        days = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+def staff_status_lines(snapshot, schedule, schedule_error):
+    """Describe scheduled and active staff for a snapshot, one section per line"""
+    if snapshot.active_staff is None:
+        return [f"Error fetching queue info for queue {snapshot.queue_id}."]
 
-        #Find the corresponding td element
-        td = parent.find("td", class_=days[day_of_week])
+    staff_str = snapshot.staff_str
+    has_active_staff = snapshot.active_staff != []
+    now = datetime.now(CAMPUS_TIMEZONE)
 
-        if (not td) and (day_of_week == 1 or day_of_week == 3):
-            await ctx.send("Currently it is big lev's lecture time.")
-            if queue_info["activeStaff"] != []:
-                await ctx.send("But there are still active staff members.")
-                await ctx.send(staff_str)
-            return
-        
-        if not td:
-            await ctx.send("Error parsing the HTML content.")
-            return
+    if not (WORKING_HOURS_START <= now.time() <= WORKING_HOURS_END):
+        if has_active_staff:
+            return [
+                "Current time is outside of working hours.",
+                "But there are still active staff members.",
+                staff_str,
+            ]
+        return [
+            "Current time is outside of working hours.",
+            "And there are no active staff members.",
+        ]
 
-        output_str = td.get_text().replace("\n", "")
-        if output_str.strip() == "":
-            await ctx.send("No staff is scheduled for duty.")
-            if queue_info["activeStaff"] != []:
-                await ctx.send("But there are still active staff members.")
-                await ctx.send(staff_str)
-            return
-        
-        if day_of_week == 2 and (hour >= 9 and hour <= 15):
-            await ctx.send(f"Currently it is {output_str}'s discussion section.")
-            await ctx.send("But there are still active staff members.")
-            await ctx.send(staff_str)
-            return
-        
-        await ctx.send(f"Currently it is {output_str}'s office hour.")
-        await ctx.send(staff_str)
+    if schedule is None:
+        return [schedule_error]
 
-@bot.command(name='checkall')
-async def check_all_command(ctx, queue_id=None):
-    """
-    Command to check both queue status and staff status
-    Usage: !checkall [queue_id]
-    """
+    # Look up the current hour in the precomputed schedule
+    hour = now.hour
+    day_of_week = now.weekday()
+    if not schedule.has_row(hour):
+        return ["Error parsing the HTML content."]
+
+    output_str = schedule.lookup(day_of_week, hour)
+    still_active = ["But there are still active staff members.", staff_str] if has_active_staff else []
+
+    if (output_str is None) and (day_of_week == 1 or day_of_week == 3):
+        return ["Currently it is big lev's lecture time."] + still_active
+
+    if output_str is None:
+        return ["Error parsing the HTML content."]
+
+    if output_str.strip() == "":
+        return ["No staff is scheduled for duty."] + still_active
+
+    if day_of_week == 2 and (hour >= 9 and hour <= 15):
+        return [
+            f"Currently it is {output_str}'s discussion section.",
+            "But there are still active staff members.",
+            staff_str,
+        ]
+
+    return [f"Currently it is {output_str}'s office hour.", staff_str]
+
+
+def resolve_queue_id(ctx, queue_id):
+    """Fall back to DEFAULT_QUEUE_ID, telling the user if neither is set"""
     if not queue_id:
         queue_id = os.getenv("DEFAULT_QUEUE_ID", "")
         if not queue_id:
-            await ctx.send(
-                "No queue ID specified. Please provide a queue ID or set the DEFAULT_QUEUE_ID environment variable."
+            send_reply(
+                ctx,
+                "No queue ID specified. Please provide a queue ID or set the DEFAULT_QUEUE_ID environment variable.",
             )
-            return
-    
-    await ctx.send(f"**Checking queue {queue_id} - Full Status Report**\n")
-    
-    # Part 1: Queue check
-    await ctx.send("**QUEUE STATUS:**")
-    
-    # Get questions for the specified queue
-    questions = await get_questions_for_queue(
-        DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN
-    )
-
-    if not questions:
-        await ctx.send(
-            f"No questions found for queue {queue_id} or error fetching questions."
-        )
-    else:
-        # Extract NetIDs and text from questions
-        netids = []
-        topics = []
-        for question in questions:
-            netid = extract_netid(question)
-            if netid:
-                netids.append(netid)
-                if question["topic"]:
-                    topics.append(question["topic"])
-        
-        await ctx.send(f"Found {len(netids)} questions with NetIDs in the queue.")
-
-        # Check if multiple members of the same group are in the queue
-        groups_in_queue = check_group_members_in_queue(
-            netids, netid_to_group, group_to_members
-        )
+    return queue_id
 
-        # Format and send the message about groups
-        message = format_groups_message(groups_in_queue, group_to_members)
-        await ctx.send(message)
 
-        # Check for questions with wrong format
-        message = check_message_format(netids, topics)
-        await ctx.send(message)
-    
-    # Part 2: Staff check
-    await ctx.send("\n**STAFF STATUS:**")
-    
-    queue_info = await get_queue_info(DEFAULT_BASE_URL, queue_id, QUEUE_TOKEN)
-    if not queue_info:
-        await ctx.send(f"Error fetching queue info for queue {queue_id}.")
+@bot.command(name='checkqueue')
+async def check_queue_command(ctx, queue_id=None):
+    """
+    Command to check for groups in the queue
+    Usage: !checkqueue [queue_id]
+    """
+    queue_id = resolve_queue_id(ctx, queue_id)
+    if not queue_id:
         return
-    
-    staff_str = ""
-    # Extract activeStaff from queue_info
-    if queue_info["activeStaff"] == []:
-        staff_str = f"No active staff found for queue {queue_id}."
-    else:
-        for staff in queue_info["activeStaff"]:
-            staff_name = staff["user"]["name"]
-            staff_str += f"{staff_name}, "
-        staff_str = staff_str[:-2]  # Remove the trailing comma and space
-        if len(queue_info["activeStaff"]) > 1:
-            staff_str = f"{staff_str} are on duty."
-        else:
-            staff_str = f"{staff_str} is on duty."
 
-    curtime = datetime.now(ZoneInfo("America/Chicago")).time()
+    snapshot = await get_queue_snapshot(queue_id)
+    response = ResponseBuilder(f"**Queue {queue_id} - group members**")
+    response.add(*queue_status_lines(snapshot))
+    response.send(ctx)
 
-    start_time = time(8, 0)  # 8:00 AM
-    end_time = time(22, 0)  # 10:00 PM
-    if not (start_time <= curtime <= end_time):
-        await ctx.send("Current time is outside of working hours.")
-        if queue_info["activeStaff"] != []:
-            await ctx.send("But there are still active staff members.")
-            await ctx.send(staff_str)
-        else:
-            await ctx.send("And there are no active staff members.")
-    else:
-        try:
-            response = await asyncio.to_thread(requests.get, OH_URL)
-            if response.status_code != 200:
-                await ctx.send(f"Error fetching office hours info: {response.status_code}")
-                return
-        except Exception as e:
-            await ctx.send(f"Exception in get_queue_info: {str(e)}")
-            return
-        
-        # Parse the HTML content
-        html = response.content.decode("utf-8")
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Find the table with class week
-        table = soup.find("table", class_="week")
-        if not table:
-            await ctx.send("Error parsing the HTML content.")
-            return
-        
-        # Find the row within the table
-        hour = datetime.now(ZoneInfo("America/Chicago")).hour
-        hour_str = ""
-        if hour <= 11:
-            hour_str = f"{str(hour)}am"
-        elif hour == 12:
-            hour_str = "noon"
-        else:
-            hour_str = f"{str(hour-12)}pm"
-
-        # Now find the td class=rh with the hour_str
-        row = table.find("td", class_="rh", string=hour_str)
-        if not row:
-            await ctx.send("Error parsing the HTML content.")
-            return
-    
-        parent = row.find_parent("tr")
-        if not parent:
-            await ctx.send("Error parsing the HTML content.")
-            return
+@bot.command(name="checkstaff")
+async def check_staff_command(ctx, queue_id=None):
+    """
+    Command to check for staff in the queue
+    Usage: !checkstaff [queue_id]
+    """
+    queue_id = resolve_queue_id(ctx, queue_id)
+    if not queue_id:
+        return
 
-        # get day of the week in number
-        day_of_week = datetime.now().weekday()
-        days = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    snapshot, (schedule, schedule_error) = await asyncio.gather(
+        get_queue_snapshot(queue_id), get_office_hours_schedule()
+    )
+    response = ResponseBuilder()
+    response.add(*staff_status_lines(snapshot, schedule, schedule_error))
+    response.send(ctx)
 
-        # Find the corresponding td element
-        td = parent.find("td", class_=days[day_of_week])
+@bot.command(name='checkall')
+async def check_all_command(ctx, queue_id=None):
+    """
+    Command to check both queue status and staff status
+    Usage: !checkall [queue_id]
+    """
+    queue_id = resolve_queue_id(ctx, queue_id)
+    if not queue_id:
+        return
 
-        if (not td) and (day_of_week == 1 or day_of_week == 3):
-            await ctx.send("Currently it is big lev's lecture time.")
-            if queue_info["activeStaff"] != []:
-                await ctx.send("But there are still active staff members.")
-                await ctx.send(staff_str)
-            return
-        
-        if not td:
-            await ctx.send("Error parsing the HTML content.")
-            return
+    # Questions, queue info and schedule are gathered once for both parts
+    snapshot, (schedule, schedule_error) = await asyncio.gather(
+        get_queue_snapshot(queue_id), get_office_hours_schedule()
+    )
 
-        output_str = td.get_text().replace("\n", "")
-        if output_str.strip() == "":
-            await ctx.send("No staff is scheduled for duty.")
-            if queue_info["activeStaff"] != []:
-                await ctx.send("But there are still active staff members.")
-                await ctx.send(staff_str)
-            return
-        
-        if day_of_week == 2 and (hour >= 9 and hour <= 15):
-            await ctx.send(f"Currently it is {output_str}'s discussion section.")
-            await ctx.send("But there are still active staff members.")
-            await ctx.send(staff_str)
-            return
-        
-        await ctx.send(f"Currently it is {output_str}'s office hour.")
-        await ctx.send(staff_str)
+    response = ResponseBuilder(f"**Checking queue {queue_id} - Full Status Report**")
+    response.add("", "**QUEUE STATUS:**", *queue_status_lines(snapshot))
+    response.add("", "**STAFF STATUS:**", *staff_status_lines(snapshot, schedule, schedule_error))
+    response.send(ctx)
 
 
 @bot.command(name='reloadgroups')
@@ -642,34 +3244,215 @@ async def reload_groups_command(ctx, csv_path=None):
     Command to reload the groups CSV file
     Usage: !reloadgroups [csv_path]
     """
-    global netid_to_group, group_to_members
-
     if not csv_path:
         csv_path = GROUPS_CSV_PATH
 
-    await ctx.send(f"Reloading groups from {csv_path}...")
+    send_reply(ctx, f"Reloading groups from {csv_path}...")
 
     try:
-        netid_to_group, group_to_members = load_groups_from_csv(csv_path)
-        await ctx.send(f"Successfully loaded {len(group_to_members)} groups!")
+        send_reply(ctx, await reload_roster(csv_path))
     except Exception as e:
-        await ctx.send(f"Error loading groups: {str(e)}")
+        send_reply(ctx, f"Error loading groups: {str(e)}")
 
 
 @bot.command(name="setinterval")
-async def set_interval_command(ctx, seconds: int):
+async def set_interval_command(ctx, seconds: int, queue_id=None):
     """
-    Command to set the check interval in seconds
-    Usage: !setinterval 300
+    Command to set the check interval in seconds, for every queue or just one
+    Usage: !setinterval 300 [queue_id]
     """
     global CHECK_INTERVAL
 
     if seconds < 60:
-        await ctx.send("Interval must be at least 60 seconds.")
+        send_reply(ctx, "Interval must be at least 60 seconds.")
+        return
+
+    if queue_id:
+        if queue_id not in monitors:
+            send_reply(ctx, f"Queue {queue_id} is not being monitored.")
+            return
+        monitors[queue_id].interval = seconds
+        send_reply(ctx, f"Check interval for queue {queue_id} set to {seconds} seconds.")
         return
 
     CHECK_INTERVAL = seconds
-    await ctx.send(f"Check interval set to {seconds} seconds.")
+    for monitor in monitors.values():
+        monitor.interval = None
+    send_reply(ctx, f"Check interval set to {seconds} seconds.")
+
+@bot.command(name="botstats")
+async def bot_stats_command(ctx):
+    """
+    Command to show the bot's internal cache statistics
+    Usage: !botstats
+    """
+    hits = cache_stats["hits"]
+    misses = cache_stats["misses"]
+    total = hits + misses
+    hit_rate = (hits / total * 100) if total else 0.0
+    response = ResponseBuilder()
+    response.add(
+        "**Response cache:**",
+        f"• Hits (304 Not Modified): {hits}",
+        f"• Misses (full download): {misses}",
+        f"• Hit rate: {hit_rate:.1f}%",
+        f"• Bytes saved: {cache_stats['bytes_saved']}",
+        f"• Parse time saved: {cache_stats['parse_seconds_saved'] * 1000:.1f} ms",
+        f"• Requests coalesced with an in-flight fetch: {cache_stats['coalesced']}",
+        f"• Requests served from a fresh result: {cache_stats['fresh_reuse']}",
+    )
+
+    # A blank line before each further section, as in a single message
+    if roster:
+        response.add(
+            "", "**Roster:**",
+            f"• {len(roster)} groups, {roster.netid_count()} netids, {roster.nbytes() / 1024:.1f} KiB",
+        )
+
+    if monitors:
+        lines = ["", "**Polling:**"]
+        for queue_id, monitor in monitors.items():
+            length = "?" if monitor.last_length is None else monitor.last_length
+            push = (", push " + ("subscribed" if monitor.subscribed else "down")) if QUEUE_PUSH else ""
+            lines.append(
+                f"• Queue {queue_id}: {length} questions, "
+                f"{monitor.idle_polls} idle polls, interval {monitor.check_interval()}s{push}"
+            )
+        response.add(*lines)
+
+    if circuit_breakers:
+        lines = ["", "**Circuit breakers:**"]
+        for host, breaker in circuit_breakers.items():
+            lines.append(f"• {host}: {breaker.state}, {breaker.failures} failures, tripped {breaker.trips} times")
+        response.add(*lines)
+
+    lines = ["", "**Worker pools:**"]
+    for kind, stats in pool_stats.items():
+        tasks = stats["tasks"]
+        average_wait = (stats["wait_total"] / tasks * 1000) if tasks else 0.0
+        average_run = (stats["run_total"] / tasks * 1000) if tasks else 0.0
+        lines.append(
+            f"• {kind}: {tasks} tasks, avg wait {average_wait:.1f} ms, "
+            f"max wait {stats['wait_max'] * 1000:.1f} ms, avg run {average_run:.1f} ms"
+        )
+    response.add(*lines)
+
+    lines = ["", "**Outbound send queues:**"]
+    if not channel_senders:
+        lines.append("• No messages sent yet")
+    for key, sender in channel_senders.items():
+        delivered = sender.sent + sender.merged
+        average = (sender.total_latency / delivered * 1000) if delivered else 0.0
+        lines.append(
+            f"• Channel {key}: depth {sender.depth()}, {sender.sent} sends "
+            f"({sender.merged} merged), avg latency {average:.0f} ms, "
+            f"max {sender.max_latency * 1000:.0f} ms, {sender.errors} errors"
+        )
+    response.add(*lines)
+    response.send(ctx)
+
+def describe_wait(seconds):
+    if seconds is None:
+        return "no estimate (no staff on duty)"
+    minutes = round(seconds / 60)
+    if minutes < 1:
+        return "under a minute"
+    if minutes < 120:
+        return f"about {minutes} min"
+    return f"about {minutes / 60:.1f} hours"
+
+
+@bot.command(name="eta")
+async def eta_command(ctx, netid=None):
+    """
+    Command to estimate the wait for a student in the queue, or for a new question
+    Usage: !eta [netid]
+    """
+    if not monitors:
+        send_reply(ctx, "No queues are being monitored.")
+        return
+
+    lines = []
+    for queue_id, monitor in monitors.items():
+        estimator = monitor.estimator
+        prefix = f"Queue {queue_id}: " if len(monitors) > 1 else ""
+        if estimator.updated_at is None:
+            lines.append(f"{prefix}No queue data yet.")
+            continue
+        waiting = len(estimator.waiting)
+        age = f" (as of {time_module.time() - estimator.updated_at:.0f}s ago)"
+
+        if netid:
+            position = estimator.position_of(netid)
+            if position is not None:
+                eta = describe_wait(estimator.estimate(position))
+                lines.append(f"{prefix}{netid} is #{position + 1} of {waiting} waiting: {eta}{age}.")
+            elif estimator.is_being_answered(netid):
+                lines.append(f"{prefix}{netid} is being answered now.")
+        else:
+            eta = describe_wait(estimator.estimate(waiting))
+            lines.append(
+                f"{prefix}{waiting} waiting, {len(estimator.active_staff)} staff on duty. "
+                f"A new question would wait {eta}{age}."
+            )
+
+    if not lines:
+        lines = [f"{netid} is not in the queue."]
+    response = ResponseBuilder()
+    response.add(*lines)
+    response.send(ctx)
+
+
+def parse_window(text):
+    """Seconds in a window such as 90m, 24h, 7d or 2w; None if it cannot be parsed"""
+    match = re.fullmatch(r"(\d+)\s*([mhdw]?)", text.strip().lower())
+    if not match:
+        return None
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 604800, "": 3600}
+    return int(match.group(1)) * units[match.group(2)]
+
+
+def format_minutes(seconds):
+    return "n/a" if seconds is None else f"{seconds / 60:.0f} min"
+
+
+@bot.command(name="queuestats")
+async def queue_stats_command(ctx, window="7d"):
+    """
+    Command to show throughput, wait times, peak length and busiest hours
+    Usage: !queuestats [window, e.g. 24h or 7d]
+    """
+    seconds = parse_window(window)
+    if not seconds:
+        send_reply(ctx, "Window must look like 90m, 24h, 7d or 2w.")
+        return
+    if not monitors:
+        send_reply(ctx, "No queues are being monitored.")
+        return
+
+    for queue_id, monitor in monitors.items():
+        summary = monitor.stats.summary(seconds)
+        hours = seconds / 3600
+        response = ResponseBuilder(f"**Queue {queue_id} - last {window}**")
+        response.add(
+            f"• Answered or removed: {summary['departures']} ({summary['departures'] / hours:.1f}/hour)",
+            f"• New questions: {summary['arrivals']}",
+            f"• Wait: median {format_minutes(summary['wait_median'])}, "
+            f"p90 {format_minutes(summary['wait_p90'])} ({summary['wait_count']} questions)",
+        )
+        if summary["peak_time"] is not None:
+            peak = datetime.fromtimestamp(summary["peak_time"], CAMPUS_TIMEZONE)
+            response.add(
+                f"• Peak length: {summary['peak_length']} "
+                f"({WEEKDAYS[peak.weekday()].capitalize()} {peak:%m/%d} {hour_label(peak.hour)})"
+            )
+        if summary["busiest_hours"]:
+            busiest = ", ".join(
+                f"{hour_label(hour)} (avg {length:.1f})" for hour, length in summary["busiest_hours"]
+            )
+            response.add(f"• Busiest hours: {busiest}")
+        response.send(ctx)
+
 
 @bot.command(name='levquote')
 async def lev_quote_command(ctx):
@@ -684,8 +3467,8 @@ async def lev_quote_command(ctx):
         "Is it normal to be confused? For you, yes",
     ]
     
-    await ctx.send("Here's a daily inspirational quote from the big lev:")
-    await ctx.send(random.choice(quotes))
+    send_reply(ctx, "Here's a daily inspirational quote from the big lev:")
+    send_reply(ctx, random.choice(quotes))
 
 
 @bot.event
@@ -694,19 +3477,25 @@ async def on_command_error(ctx, error):
     if isinstance(error, commands.errors.CommandNotFound):
         pass  # Ignore command not found errors
     else:
-        await ctx.send(f"An error occurred: {str(error)}")
-        print(f"Error in command {ctx.command}: {str(error)}")
+        ERRORS_TOTAL.inc("command")
+        send_reply(ctx, f"An error occurred: {str(error)}")
+        log.error("Error in command %s: %s", ctx.command, error)
 
 
 # Run the bot
 if __name__ == "__main__":
-    if not DISCORD_TOKEN:
-        print(
-            "Error: No Discord token provided. Set the DISCORD_TOKEN environment variable."
-        )
-    elif not QUEUE_TOKEN:
-        print(
-            "Error: No Queue token provided. Set the QUEUE_TOKEN environment variable."
-        )
-    else:
-        bot.run(DISCORD_TOKEN)
+    setup_logging()
+    try:
+        if not DISCORD_TOKEN:
+            log.error(
+                "Error: No Discord token provided. Set the DISCORD_TOKEN environment variable."
+            )
+        elif not QUEUE_TOKEN:
+            log.error(
+                "Error: No Queue token provided. Set the QUEUE_TOKEN environment variable."
+            )
+        else:
+            # log_handler=None: discord.py logs through our root handler
+            bot.run(DISCORD_TOKEN, log_handler=None)
+    finally:
+        stop_logging()
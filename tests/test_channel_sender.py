@@ -0,0 +1,49 @@
+import asyncio
+
+import queue_bot
+
+
+class FakeChannel:
+    def __init__(self, id=1, fail=False):
+        self.id = id
+        self.fail = fail
+        self.sent = []
+
+    async def send(self, content=None, embeds=None):
+        if self.fail:
+            raise RuntimeError("rejected")
+        if content is not None and len(content) > queue_bot.DISCORD_MESSAGE_LIMIT:
+            raise RuntimeError("Must be 2000 or fewer in length.")
+        self.sent.append(content)
+
+
+def send(channel, *texts):
+    """Queue texts on a fresh sender and return the delivered flags"""
+    async def main():
+        sender = queue_bot.ChannelSender(channel)
+        futures = [sender.submit(queue_bot.OutboundMessage(text), queue_bot.PRIORITY_REPLY) for text in texts]
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            sender.worker.cancel()
+    return asyncio.run(main())
+
+
+def test_short_messages_are_merged():
+    channel = FakeChannel()
+    assert send(channel, "one", "two") == [True, True]
+    assert channel.sent == ["one\ntwo"]
+
+
+def test_oversized_message_is_split():
+    channel = FakeChannel()
+    text = "\n".join(f"line {n:04d} " + "x" * 40 for n in range(100))
+    assert send(channel, text) == [True]
+    assert len(channel.sent) > 1
+    assert all(len(page) <= queue_bot.DISCORD_MESSAGE_LIMIT for page in channel.sent)
+    assert "\n".join(channel.sent) == text
+
+
+def test_failed_send_is_not_delivered():
+    channel = FakeChannel(fail=True)
+    assert send(channel, "one") == [False]
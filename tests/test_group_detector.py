@@ -0,0 +1,120 @@
+import asyncio
+
+import queue_bot
+
+ROSTER = queue_bot.Roster.from_groups([(1, ["abc1", "def2", "ghi3"]), (2, ["jkl4", "mno5"])])
+
+
+def question(question_id, netid, topic=""):
+    return {"id": question_id, "topic": topic, "askedBy": {"netid": netid}}
+
+
+def test_sync_alerts_on_new_members_only():
+    detector = queue_bot.GroupCollisionDetector(ROSTER)
+    assert detector.sync([question(1, "abc1"), question(2, "jkl4")]) == {}
+    assert detector.sync([question(1, "abc1"), question(2, "jkl4"), question(3, "def2")]) == {
+        "Group 1": ["abc1", "def2"]
+    }
+
+    # The same member asking again is not a new collision
+    assert detector.sync([question(1, "abc1"), question(2, "jkl4"), question(3, "def2"), question(4, "abc1")]) == {}
+    # Another member of the same group is
+    assert detector.sync([question(1, "abc1"), question(3, "def2"), question(4, "abc1"), question(5, "ghi3")]) == {
+        "Group 1": ["abc1", "def2", "ghi3"]
+    }
+    assert detector.collisions() == {"Group 1": ["abc1", "def2", "ghi3"]}
+
+
+def test_member_who_leaves_and_rejoins_alerts_again():
+    detector = queue_bot.GroupCollisionDetector(ROSTER)
+    assert detector.sync([question(1, "jkl4"), question(2, "mno5")]) == {"Group 2": ["jkl4", "mno5"]}
+    assert detector.sync([question(1, "jkl4")]) == {}
+    assert detector.collisions() == {}
+    assert detector.sync([question(1, "jkl4"), question(3, "mno5")]) == {"Group 2": ["jkl4", "mno5"]}
+
+
+def test_member_with_two_questions_leaves_only_with_the_last():
+    detector = queue_bot.GroupCollisionDetector(ROSTER)
+    detector.sync([question(1, "abc1"), question(2, "abc1"), question(3, "def2")])
+    assert detector.sync([question(2, "abc1"), question(3, "def2")]) == {}
+    assert detector.collisions() == {"Group 1": ["abc1", "def2"]}
+
+
+def test_restore_does_not_alert():
+    detector = queue_bot.GroupCollisionDetector(ROSTER)
+    detector.restore({1: "abc1", 2: "def2"})
+    assert detector.collisions() == {"Group 1": ["abc1", "def2"]}
+    # The restored questions are already known, so the first poll after a restart is quiet
+    assert detector.sync([question(1, "abc1"), question(2, "def2")]) == {}
+
+
+def test_set_roster_rekeys_tracked_questions():
+    detector = queue_bot.GroupCollisionDetector(ROSTER)
+    detector.sync([question(1, "abc1"), question(2, "jkl4")])
+    assert detector.collisions() == {}
+
+    regrouped = queue_bot.Roster.from_groups([(1, ["abc1", "jkl4"]), (7, ["def2"])])
+    detector.set_roster(regrouped)
+    assert detector.collisions() == {"Group 1": ["abc1", "jkl4"]}
+    assert detector.sync([question(1, "abc1"), question(2, "jkl4")]) == {}
+    assert detector.question_added(3, "def2") is None
+
+
+class FakeChannel:
+    def __init__(self, id):
+        self.id = id
+        self.sent = []
+
+    async def send(self, content=None, embeds=None):
+        self.sent.append(content)
+
+
+def run_deltas(monkeypatch, deltas):
+    """Feed (old question, new question) deltas to one queue; returns (monitor, messages sent)"""
+    channel = FakeChannel(1000)
+    monkeypatch.setattr(queue_bot, "roster", ROSTER)
+    monkeypatch.setattr(queue_bot.bot, "get_channel", {channel.id: channel}.get)
+
+    async def main():
+        monitor = queue_bot.QueueMonitor("1", channel_id=channel.id)
+        live = queue_bot.live_questions.setdefault("1", {})
+        for old_question, new_question in deltas:
+            if old_question:
+                live.pop(old_question["id"], None)
+            if new_question:
+                live[new_question["id"]] = new_question
+            await queue_bot.process_queue_delta(monitor, old_question, new_question)
+        sender = queue_bot.channel_senders.pop(channel.id, None)
+        if sender:
+            await asyncio.gather(*[m.delivered for pending in sender.pending.values() for m in pending])
+            sender.worker.cancel()
+        queue_bot.live_questions.pop("1", None)
+        return monitor
+
+    monitor = asyncio.run(main())
+    return monitor, channel.sent
+
+
+def test_delta_from_the_same_student_does_not_realert(monkeypatch):
+    first, second = question(1, "abc1", "MP3"), question(2, "def2", "MP3")
+    monitor, alerts = run_deltas(monkeypatch, [
+        (None, first),
+        (None, second),
+        (second, question(2, "def2", "MP3 comp 4")),  # Topic edit
+        (first, dict(first, beingAnswered=True)),  # Status change
+    ])
+    assert "\n".join(alerts).count("**Group 1**") == 1
+    assert monitor.detector.question_netids == {1: "abc1", 2: "def2"}
+    assert monitor.detector.collisions() == {"Group 1": ["abc1", "def2"]}
+
+
+def test_delta_removal_then_rejoin_alerts_again(monkeypatch):
+    first, second = question(1, "jkl4"), question(2, "mno5")
+    _, alerts = run_deltas(monkeypatch, [
+        (None, first),
+        (None, second),
+        (second, None),
+        (None, question(3, "mno5")),
+    ])
+    # The sender merges queued alerts into one message; count the alerts themselves
+    assert "\n".join(alerts).count("**Group 2**") == 2
@@ -0,0 +1,191 @@
+import os
+
+import pytest
+
+import queue_bot
+
+T0 = 1_760_000_000_000  # Milliseconds
+
+POLLS = [
+    (T0, {1: ("abc1", "MP3 group 1 comp 2", T0 - 5_000, None), 2: ("def2", "", T0, None)}, 3),
+    (T0 + 60_000, {
+        1: ("abc1", "MP3 group 1 comp 2", T0 - 5_000, T0 + 30_000),
+        2: ("def2", "", T0, None),
+        7: ("ghi3", "Conceptual ü", None, None),
+    }, 2),
+    (T0 + 120_000, {7: ("ghi3", "Conceptual ü", None, None)}, None),
+    (T0 + 180_000, {}, 0),
+    (T0 + 240_000, {7: ("ghi3", "edited topic", T0, None), 300: ("jkl4", "x" * 200, T0 + 239_999, None)}, 4),
+]
+
+
+def write_polls(path, polls):
+    writer = queue_bot.HistoryPartitionWriter(path)
+    for timestamp_ms, questions, staff_count in polls:
+        writer.append(timestamp_ms, dict(questions), staff_count)
+    writer.close()
+
+
+def as_tuples(records):
+    return [(round(r.timestamp * 1000), r.questions, r.staff_count) for r in records]
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2**32, 2**63])
+def test_varint_round_trip(value):
+    out = bytearray()
+    queue_bot.encode_varint(value, out)
+    assert queue_bot.decode_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_partition_round_trip(tmp_path):
+    path = str(tmp_path / "day.qh")
+    write_polls(path, POLLS)
+    records, valid_length = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == POLLS
+    assert valid_length == os.path.getsize(path)
+
+
+def test_reopen_and_append(tmp_path):
+    path = str(tmp_path / "day.qh")
+    write_polls(path, POLLS[:2])
+    write_polls(path, POLLS[2:])  # A restarted writer encodes against the last stored state
+    records, _ = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == POLLS
+
+
+def test_truncated_tail_is_dropped_and_repaired(tmp_path):
+    path = str(tmp_path / "day.qh")
+    write_polls(path, POLLS[:3])
+    intact_size = os.path.getsize(path)
+    write_polls(path, POLLS[3:4])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)  # Crash in the middle of the last record
+
+    records, valid_length = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == POLLS[:3]
+    assert valid_length == intact_size
+
+    # The next writer cuts the torn record off before appending
+    write_polls(path, POLLS[3:])
+    records, _ = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == POLLS
+
+
+def test_every_truncation_point_yields_a_prefix(tmp_path):
+    path = str(tmp_path / "day.qh")
+    write_polls(path, POLLS)
+    with open(path, "rb") as f:
+        data = f.read()
+    for cut in range(len(data)):
+        with open(path, "wb") as f:
+            f.write(data[:cut])
+        records, _ = queue_bot.read_history_partition(path)
+        assert as_tuples(records) == POLLS[:len(records)]
+
+
+def test_bad_magic_is_ignored_and_overwritten(tmp_path):
+    path = str(tmp_path / "day.qh")
+    with open(path, "wb") as f:
+        f.write(b"not a history file")
+    assert queue_bot.read_history_partition(path) == ([], 0)
+
+    write_polls(path, POLLS[:2])
+    records, _ = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == POLLS[:2]
+
+
+def test_store_scan_and_replay_agree(tmp_path):
+    store = queue_bot.HistoryStore(str(tmp_path))
+    day = 86_400
+    for timestamp_ms, questions, staff_count in POLLS:
+        # Spread the polls over two UTC days to cross a partition boundary
+        store.write("1", timestamp_ms / 1000 + (day if timestamp_ms > T0 + 100_000 else 0), questions, staff_count)
+    for _, writer in store.writers.values():
+        writer.close()
+    store.executor.shutdown()
+
+    start, end = T0 / 1000, T0 / 1000 + 2 * day
+    records = list(store.scan("1", start, end))
+    assert len(os.listdir(store.queue_directory("1"))) == 2
+    assert [r.questions for r in records] == [questions for _, questions, _ in POLLS]
+    assert [(t, dict(q)) for t, q in store.replay("1", start, end)] == [(r.timestamp, r.questions) for r in records]
+
+
+def write_v1_partition(path, polls):
+    """The QBHIST1 encoding: like the current one, without question times"""
+    out = bytearray(queue_bot.HISTORY_MAGIC_V1)
+    queue_bot.encode_varint(polls[0][0], out)
+    previous_ms, previous = polls[0][0], {}
+    for timestamp_ms, questions, staff_count in polls:
+        payload = bytearray()
+        queue_bot.encode_varint(timestamp_ms - previous_ms, payload)
+        queue_bot.encode_optional(staff_count, payload)
+        removed = sorted(set(previous) - set(questions))
+        added = sorted(question_id for question_id in questions if question_id not in previous)
+        for ids in (removed, added):
+            queue_bot.encode_varint(len(ids), payload)
+            last = 0
+            for question_id in ids:
+                queue_bot.encode_varint(question_id - last, payload)
+                last = question_id
+                if ids is added:
+                    queue_bot.encode_string(questions[question_id][0], payload)
+                    queue_bot.encode_string(questions[question_id][1], payload)
+        queue_bot.encode_varint(len(payload), out)
+        out += payload
+        previous_ms, previous = timestamp_ms, questions
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def test_v1_partition_is_read_and_upgraded_on_append(tmp_path):
+    path = str(tmp_path / "day.qh")
+    v1_polls = [(t, {q: (netid, topic) for q, (netid, topic, _, _) in questions.items()}, staff)
+                for t, questions, staff in POLLS[:3]]
+    write_v1_partition(path, v1_polls)
+    without_times = [(t, {q: (netid, topic, None, None) for q, (netid, topic) in questions.items()}, staff)
+                     for t, questions, staff in v1_polls]
+    records, _ = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == without_times
+
+    write_polls(path, POLLS[3:])
+    assert queue_bot.has_history_magic(path)
+    records, _ = queue_bot.read_history_partition(path)
+    assert as_tuples(records) == without_times + POLLS[3:]
+
+
+def test_replayed_waits_match_the_live_estimator(tmp_path):
+    """Warm-up from history must measure the same waits as the live poll ticks"""
+    def question(question_id, enqueued, answer_started=None):
+        q = {"id": question_id, "enqueueTime": f"2025-03-04T15:{enqueued:02d}:00.000Z",
+             "askedBy": {"netid": f"s{question_id}"}, "topic": ""}
+        if answer_started is not None:
+            q.update(beingAnswered=True, answerStartTime=f"2025-03-04T15:{answer_started:02d}:30.000Z")
+        return q
+
+    polls = [
+        [question(1, 0), question(2, 1)],
+        [question(1, 0, 3), question(2, 1), question(3, 4)],
+        [question(2, 1), question(3, 4)],  # 1 answered, 2 still waiting
+        [question(3, 4, 6)],  # 2 left unanswered
+        [],
+    ]
+    start = queue_bot.parse_api_time("2025-03-04T15:05:00Z")
+    estimator = queue_bot.WaitTimeEstimator()
+    live = queue_bot.QueueStats()
+    store = queue_bot.HistoryStore(str(tmp_path))
+    for n, questions in enumerate(polls):
+        now = start + 60 * n
+        waits = estimator.observe(questions, now=now)
+        live.record(now, [q["id"] for q in questions], waits)
+        store.append("1", now, questions, None, estimator)
+    store.executor.shutdown()
+    for _, writer in store.writers.values():
+        writer.close()
+
+    replayed, count = queue_bot.build_queue_stats(store.replay("1", start, start + 3600))
+    assert count == len(polls)
+    assert sum(bucket.waits.total for bucket in live.buckets.values()) == 3
+    assert {hour: bucket.waits.counts for hour, bucket in replayed.buckets.items()} == {
+        hour: bucket.waits.counts for hour, bucket in live.buckets.items()
+    }
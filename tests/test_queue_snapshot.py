@@ -0,0 +1,26 @@
+import pytest
+
+import queue_bot
+
+QUESTIONS = queue_bot.FetchResult.success([{"id": 1, "topic": "MP3", "askedBy": {"netid": "abc1"}}])
+STAFF = [{"user": {"name": "Lev"}}]
+
+
+@pytest.mark.parametrize("info_result", [
+    queue_bot.FetchResult.success([]),  # EMPTY counts as fresh
+    queue_bot.FetchResult(queue_bot.FetchResult.ERROR, error="503"),
+    queue_bot.FetchResult.success({"name": "ECE 391"}),
+    queue_bot.FetchResult.success({"activeStaff": "nobody"}),
+])
+def test_missing_or_malformed_queue_info(info_result):
+    snapshot = queue_bot.QueueSnapshot("1", QUESTIONS, info_result)
+    assert snapshot.active_staff is None
+    assert queue_bot.staff_status_lines(snapshot, None, "no schedule") == [
+        "Error fetching queue info for queue 1."
+    ]
+
+
+def test_active_staff():
+    snapshot = queue_bot.QueueSnapshot("1", QUESTIONS, queue_bot.FetchResult.success({"activeStaff": STAFF}))
+    assert snapshot.active_staff == STAFF
+    assert snapshot.staff_str == "Lev is on duty."
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import queue_bot
+
+GROUPS = [["abc1", "def2"], ["ghi3", "jkl4", "mno5"], ["pqr6"]]
+
+
+@pytest.fixture
+def groups_csv(tmp_path):
+    path = tmp_path / "groups.csv"
+    path.write_text("member1,member2,member3\n" + "".join(",".join(row) + "\n" for row in GROUPS))
+    return str(path)
+
+
+def source_key(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": queue_bot.file_sha256(path)}
+
+
+def assert_same_roster(loaded, expected):
+    assert loaded.netid_blob == expected.netid_blob
+    for name in queue_bot.ROSTER_SNAPSHOT_ARRAYS:
+        assert getattr(loaded, name) == getattr(expected, name)
+
+
+def test_snapshot_round_trip(groups_csv, tmp_path):
+    roster = queue_bot.load_groups_from_csv(groups_csv)
+    key = source_key(groups_csv)
+    snapshot = str(tmp_path / "groups.snapshot")
+    queue_bot.save_roster_snapshot(roster, snapshot, key)
+
+    loaded_key, loaded = queue_bot.load_roster_snapshot(snapshot)
+    assert loaded_key == key
+    assert_same_roster(loaded, roster)
+    assert loaded.group_id(loaded.group_index("jkl4")) == "Group 2"
+    assert loaded.members("Group 2") == GROUPS[1]
+    assert loaded.group_index("nobody") == -1
+
+
+def test_empty_roster_round_trip(tmp_path):
+    snapshot = str(tmp_path / "empty.snapshot")
+    queue_bot.save_roster_snapshot(queue_bot.Roster(), snapshot, {"mtime_ns": 0, "size": 0, "sha256": ""})
+    _, loaded = queue_bot.load_roster_snapshot(snapshot)
+    assert len(loaded) == 0 and loaded.netid_count() == 0
+
+
+def test_cached_roster_follows_the_csv(groups_csv, tmp_path):
+    snapshot = str(tmp_path / "groups.snapshot")
+    queue_bot.save_roster_snapshot(queue_bot.load_groups_from_csv(groups_csv), snapshot, source_key(groups_csv))
+    roster, key = queue_bot.load_cached_roster(groups_csv, snapshot)
+    assert key is None and len(roster) == len(GROUPS)
+
+    # Touched but unchanged: reuse the snapshot and ask for its key to be refreshed
+    os.utime(groups_csv, ns=(1, 1))
+    roster, key = queue_bot.load_cached_roster(groups_csv, snapshot)
+    assert roster is not None and key["mtime_ns"] == 1
+
+    with open(groups_csv, "a") as f:
+        f.write("stu7,vwx8\n")
+    roster, key = queue_bot.load_cached_roster(groups_csv, snapshot)
+    assert roster is None and key == source_key(groups_csv)
+
+
+def load_roster(path):
+    try:
+        return asyncio.run(queue_bot.load_roster(path))
+    finally:
+        queue_bot.shutdown_worker_pools()
+
+
+def test_only_the_configured_csv_is_snapshotted(groups_csv, monkeypatch):
+    assert queue_bot.roster_cache_path(groups_csv) is None
+    assert len(load_roster(groups_csv)) == len(GROUPS)
+    assert os.listdir(os.path.dirname(groups_csv)) == ["groups.csv"]
+
+    monkeypatch.setattr(queue_bot, "GROUPS_CSV_PATH", groups_csv)
+    load_roster(groups_csv)
+    assert os.path.exists(f"{groups_csv}.cache")
+
+
+def write_snapshot(path, magic, header, body=b""):
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(header if isinstance(header, bytes) else json.dumps(header).encode() + b"\n")
+        f.write(body)
+
+
+@pytest.mark.parametrize("magic, header", [
+    (b"QBROSTER1\n", {"mtime_ns": 0, "size": 0, "sha256": ""}),  # Older formats
+    (b"QBROSTER2\n", {"mtime_ns": 0, "size": 0, "sha256": ""}),
+    (queue_bot.ROSTER_SNAPSHOT_MAGIC, b"{not json\n"),
+    (queue_bot.ROSTER_SNAPSHOT_MAGIC, ["a", "list"]),
+    (queue_bot.ROSTER_SNAPSHOT_MAGIC, {"mtime_ns": 0}),
+    (b"\x00\xff garbage\n", b"\n"),
+])
+def test_stale_or_garbled_header_is_rejected(tmp_path, magic, header):
+    path = str(tmp_path / "bad.snapshot")
+    write_snapshot(path, magic, header)
+    assert queue_bot.load_roster_snapshot(path) is None
+
+
+def test_wrong_byteorder_is_rejected(groups_csv, tmp_path):
+    path = str(tmp_path / "groups.snapshot")
+    queue_bot.save_roster_snapshot(queue_bot.load_groups_from_csv(groups_csv), path, source_key(groups_csv))
+    with open(path, "rb") as f:
+        magic, header, body = f.readline(), json.loads(f.readline()), f.read()
+    header["byteorder"] = "big" if header["byteorder"] == "little" else "little"
+    write_snapshot(path, magic, header, body)
+    assert queue_bot.load_roster_snapshot(path) is None
+
+
+def test_truncated_snapshot_is_rejected(groups_csv, tmp_path):
+    path = str(tmp_path / "groups.snapshot")
+    queue_bot.save_roster_snapshot(queue_bot.load_groups_from_csv(groups_csv), path, source_key(groups_csv))
+    size = os.path.getsize(path)
+    for cut in (size - 1, size - 20, size // 2):
+        with open(path, "r+b") as f:
+            f.truncate(cut)
+        assert queue_bot.load_roster_snapshot(path) is None
+
+
+def test_missing_snapshot(tmp_path):
+    assert queue_bot.load_roster_snapshot(str(tmp_path / "missing")) is None
+
+
+def test_failed_parse_is_not_snapshotted(tmp_path, monkeypatch):
+    path = str(tmp_path / "groups.csv")
+    with open(path, "wb") as f:
+        f.write(b"member1,member2\nabc1,\xff\xfe\n")
+    monkeypatch.setattr(queue_bot, "GROUPS_CSV_PATH", path)
+    load_roster(path)
+    assert not os.path.exists(queue_bot.roster_cache_path(path))
+
+
+def test_unreadable_csv_falls_through_to_the_parse(tmp_path):
+    directory = str(tmp_path / "groups.csv")
+    os.mkdir(directory)
+    assert queue_bot.load_cached_roster(directory, f"{directory}.cache") == (None, None)